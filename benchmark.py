@@ -0,0 +1,318 @@
+"""
+Project: ProcessSim
+Made By: Arno Kasper
+Version: 1.0.0
+"""
+from functools import wraps
+from itertools import product
+import multiprocessing
+import statistics
+import platform
+import argparse
+import json
+import time
+import sys
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+import simulationmodel as sim
+from resultcache import code_version
+
+# the scenario matrix
+ROUTINGS = ["GFS", "RJS", "PFS"]
+DISPATCHING_RULES = ["FCFS", "SPT", "ODD_land", "MODD"]
+RELEASE_METHODS = ["immediate", "LUMS_COR", "pure_periodic"]
+UTILIZATIONS = [0.8, 0.9]
+SHOP_SIZES = [6, 12]
+
+# large shops with sparse routings, a pure flow shop visits all work centres and is left out
+LARGE_SHOP_ROUTINGS = ["GFS", "RJS"]
+LARGE_SHOP_SIZES = [200, 1000]
+MAX_ROUTING_LENGTH = 10
+
+# simulation engines, the results of both must be identical
+ENGINES = ["simpy", "calendar"]
+
+# measures compared to the baseline, with the direction of an improvement
+MEASURES = {"orders_per_second": "higher",
+            "events_per_second": "higher",
+            "peak_rss_mb": "lower",
+            "time_to_first_result": "lower"}
+
+
+def scenario_matrix(utilizations=UTILIZATIONS, shop_sizes=SHOP_SIZES, large_shop_sizes=LARGE_SHOP_SIZES,
+                    run_time=2000, warm_up_period=500, number_of_runs=2, engine="simpy"):
+    """
+    make the scenarios of the benchmark, the settings of the control panels for each combination of routing,
+    dispatching rule, release method, utilization and shop size. The large shops have sparse routings and their
+    run time is shortened, to about the number of orders of the smallest shop
+    :param utilizations: list with the aimed utilizations
+    :param shop_sizes: list with the numbers of work centres
+    :param large_shop_sizes: list with the numbers of work centres of the large shops
+    :param run_time: run time of a run
+    :param warm_up_period: warm-up period of a run
+    :param number_of_runs: number of runs of a scenario
+    :param engine: simulation engine, simpy or calendar
+    :return: list with the scenarios
+    """
+    matrix = [(routing, rule, release, utilization, shop_size, False) for routing, rule, release, utilization, shop_size
+              in product(ROUTINGS, DISPATCHING_RULES, RELEASE_METHODS, utilizations, shop_sizes)]
+    matrix += [(routing, rule, release, utilization, shop_size, True) for routing, rule, release, utilization, shop_size
+               in product(LARGE_SHOP_ROUTINGS, DISPATCHING_RULES, RELEASE_METHODS, utilizations, large_shop_sizes)]
+
+    scenarios = list()
+    for routing, rule, release, utilization, shop_size, large_shop in matrix:
+        model_settings = {"print_info": False,
+                          "WC_AND_FLOW_CONFIGURATION": routing,
+                          "AIMED_UTILIZATION": utilization,
+                          "NUMBER_OF_WORKCENTRES": shop_size,
+                          "WARM_UP_PERIOD": warm_up_period,
+                          "RUN_TIME": run_time,
+                          "NUMBER_OF_RUNS": number_of_runs,
+                          "SIMULATION_ENGINE": engine}
+        name = f"{routing}_{rule}_{release}_u{utilization}_wc{shop_size}"
+        if large_shop:
+            time_scale = min(shop_sizes or SHOP_SIZES) / shop_size
+            model_settings.update({"LARGE_SHOP": True,
+                                   "MAX_ROUTING_LENGTH": MAX_ROUTING_LENGTH,
+                                   "WARM_UP_PERIOD": warm_up_period * time_scale,
+                                   "RUN_TIME": run_time * time_scale})
+            name += "_large"
+        policy_settings = {"dispatching_rule": rule,
+                           "release_control": release != "immediate"}
+        if release != "immediate":
+            policy_settings["release_control_method"] = release
+
+        scenarios.append({"name": name,
+                          "model_settings": model_settings,
+                          "policy_settings": policy_settings})
+    return scenarios
+
+
+def peak_rss():
+    """
+    :return: peak resident set size of the process in megabytes, None if unknown
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    if sys.platform == "darwin":
+        return peak / 1024 ** 2
+    return peak / 1024
+
+
+def run_scenario(scenario):
+    """
+    run a scenario and measure the simulation, used as task for a fresh worker process
+    :param scenario: dictionary with the name and the settings of the scenario
+    :return: dictionary with the measurements
+    """
+    simulation = sim.SimulationModel(exp_number=0,
+                                     model_settings=scenario["model_settings"],
+                                     policy_settings=scenario["policy_settings"])
+    measurement = {"events": 0, "first_result": None}
+
+    # count the events of SimPy, the calendar engine counts the scheduled events itself
+    if hasattr(simulation.env, "step"):
+        step = simulation.env.step
+
+        @wraps(step)
+        def counted_step():
+            measurement["events"] += 1
+            return step()
+        simulation.env.step = counted_step
+
+    # the first result is the data of the first run
+    store_run_data = simulation.data_collection.store_run_data
+
+    @wraps(store_run_data)
+    def timed_store_run_data():
+        if measurement["first_result"] is None:
+            measurement["first_result"] = time.perf_counter()
+        return store_run_data()
+    simulation.data_collection.store_run_data = timed_store_run_data
+
+    start_time = time.perf_counter()
+    simulation.sim_function()
+    wall_time = max(time.perf_counter() - start_time, 1e-9)
+
+    events = measurement["events"]
+    if not hasattr(simulation.env, "step"):
+        # the events left in the queue are not served
+        events = simulation.env.counter - len(simulation.env.queue)
+
+    time_to_first_result = None
+    if measurement["first_result"] is not None:
+        time_to_first_result = measurement["first_result"] - start_time
+
+    return {"name": scenario["name"],
+            "wall_time": wall_time,
+            "orders": simulation.data_exp.order_output_counter,
+            "orders_per_second": simulation.data_exp.order_output_counter / wall_time,
+            "events": events,
+            "events_per_second": events / wall_time,
+            "peak_rss_mb": peak_rss(),
+            "time_to_first_result": time_to_first_result}
+
+
+def run_benchmark(scenarios, repeats=1):
+    """
+    run each scenario in a fresh process, one after another to avoid interference of the measurements. The median of
+    the repeats is reported
+    :param scenarios: list with the scenarios
+    :param repeats: number of times each scenario is run
+    :return: dictionary with the measurements of each scenario
+    """
+    results = dict()
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        for scenario in scenarios:
+            measurements = pool.map(run_scenario, [scenario] * repeats, chunksize=1)
+            result = {"model_settings": scenario["model_settings"],
+                      "policy_settings": scenario["policy_settings"],
+                      "orders": measurements[0]["orders"],
+                      "events": measurements[0]["events"]}
+            for measure in ["wall_time"] + list(MEASURES):
+                values = [measurement[measure] for measurement in measurements if measurement[measure] is not None]
+                result[measure] = statistics.median(values) if values else None
+            results[scenario["name"]] = result
+            print(f"{scenario['name']:<40} {result['orders_per_second']:>10.0f} orders/s "
+                  f"{result['events_per_second']:>10.0f} events/s")
+    return results
+
+
+def run_database(scenario):
+    """
+    run a scenario and keep its results, used as task for a fresh worker process
+    :param scenario: dictionary with the name and the settings of the scenario
+    :return: run database, order input counter, order output counter
+    """
+    simulation = sim.SimulationModel(exp_number=0,
+                                     model_settings=scenario["model_settings"],
+                                     policy_settings=scenario["policy_settings"])
+    simulation.sim_function()
+    return simulation.data_exp.database, simulation.data_exp.order_input_counter, \
+        simulation.data_exp.order_output_counter
+
+
+def compare_engines(scenarios):
+    """
+    run each scenario with SimPy and with the calendar engine, both engines must give the same results
+    :param scenarios: list with the scenarios
+    :return: list with the mismatches
+    """
+    mismatches = list()
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        for scenario in scenarios:
+            tasks = [{"name": scenario["name"],
+                      "model_settings": dict(scenario["model_settings"], SIMULATION_ENGINE=engine),
+                      "policy_settings": scenario["policy_settings"]} for engine in ENGINES]
+            (simpy_runs, *simpy_counters), (calendar_runs, *calendar_counters) = \
+                pool.map(run_database, tasks, chunksize=1)
+
+            differences = list()
+            if simpy_counters != calendar_counters:
+                differences.append("order counters")
+            if simpy_runs is None or calendar_runs is None:
+                if simpy_runs is not calendar_runs:
+                    differences.append("run database")
+            else:
+                for column in simpy_runs.columns.union(calendar_runs.columns, sort=False):
+                    if column not in simpy_runs.columns or column not in calendar_runs.columns or \
+                            not simpy_runs[column].equals(calendar_runs[column]):
+                        differences.append(column)
+            if differences:
+                mismatches.append({"name": scenario["name"], "differences": differences})
+            print(f"{scenario['name']:<40} {'differs' if differences else 'identical'}")
+    return mismatches
+
+
+def compare(results, baseline, tolerance):
+    """
+    compare the measurements to the baseline, a measure is a regression if it is worse than the tolerance
+    :param results: dictionary with the measurements of each scenario
+    :param baseline: dictionary with the measurements of each scenario of the baseline
+    :param tolerance: allowed relative change, e.g. 0.1 for 10%
+    :return: list with the regressions
+    """
+    regressions = list()
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for measure, direction in MEASURES.items():
+            value = result.get(measure)
+            reference = baseline[name].get(measure)
+            if value is None or not reference:
+                continue
+            change = (value - reference) / reference
+            if (direction == "higher" and change < -tolerance) or (direction == "lower" and change > tolerance):
+                regressions.append({"name": name,
+                                    "measure": measure,
+                                    "baseline": reference,
+                                    "value": value,
+                                    "change": change})
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="benchmark of the simulation model over a matrix of scenarios")
+    parser.add_argument("--output", default="benchmark.json", help="JSON file for the results")
+    parser.add_argument("--baseline", default=None, help="JSON file with the results of an earlier benchmark")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative change to the baseline")
+    parser.add_argument("--select", nargs="*", default=None,
+                        help="run only the scenarios whose name contains all of these parts, e.g. GFS SPT")
+    parser.add_argument("--utilizations", nargs="*", type=float, default=UTILIZATIONS)
+    parser.add_argument("--shop-sizes", nargs="*", type=int, default=SHOP_SIZES)
+    parser.add_argument("--large-shop-sizes", nargs="*", type=int, default=LARGE_SHOP_SIZES)
+    parser.add_argument("--engine", default="simpy", choices=ENGINES)
+    parser.add_argument("--compare-engines", action="store_true",
+                        help="check that both simulation engines give the same results instead of measuring")
+    parser.add_argument("--run-time", type=float, default=2000)
+    parser.add_argument("--warm-up-period", type=float, default=500)
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--repeats", type=int, default=1)
+    arguments = parser.parse_args()
+
+    scenarios = scenario_matrix(utilizations=arguments.utilizations, shop_sizes=arguments.shop_sizes,
+                                large_shop_sizes=arguments.large_shop_sizes, run_time=arguments.run_time, warm_up_period=arguments.warm_up_period,
+                                number_of_runs=arguments.runs, engine=arguments.engine)
+    if arguments.select:
+        scenarios = [scenario for scenario in scenarios
+                     if all(part in scenario["name"] for part in arguments.select)]
+
+    if arguments.compare_engines:
+        mismatches = compare_engines(scenarios=scenarios)
+        for mismatch in mismatches:
+            print(f"mismatch {mismatch['name']:<40} {', '.join(str(name) for name in mismatch['differences'])}")
+        print(f"{len(mismatches)} of {len(scenarios)} scenarios differ between the simulation engines")
+        sys.exit(1 if mismatches else 0)
+
+    benchmark = {"code_version": code_version(),
+                 "python": platform.python_version(),
+                 "platform": platform.platform(),
+                 "engine": arguments.engine,
+                 "repeats": arguments.repeats,
+                 "scenarios": run_benchmark(scenarios=scenarios, repeats=arguments.repeats)}
+    with open(arguments.output, "w") as file:
+        json.dump(benchmark, file, indent=2)
+    print(f"\n{len(scenarios)} scenarios written to {arguments.output}")
+
+    # compare to the baseline
+    if arguments.baseline is not None:
+        with open(arguments.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results=benchmark["scenarios"], baseline=baseline["scenarios"],
+                              tolerance=arguments.tolerance)
+        if baseline.get("engine") != benchmark["engine"]:
+            print("the baseline is of another simulation engine, the events are counted differently")
+        for regression in regressions:
+            print(f"regression {regression['name']:<40} {regression['measure']:<22} "
+                  f"{regression['baseline']:>12.3f} -> {regression['value']:>12.3f} ({regression['change']:+.1%})")
+        print(f"{len(regressions)} regressions beyond a tolerance of {arguments.tolerance:.0%}")
+        if regressions:
+            sys.exit(1)
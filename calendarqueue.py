@@ -0,0 +1,229 @@
+"""
+Project: ProcessSim
+Made By: Arno Kasper
+Version: 1.0.0
+"""
+from bisect import insort
+from heapq import nsmallest
+import math
+
+# event priorities as in SimPy, the start of a process comes before the other events at the same time
+URGENT = 0
+NORMAL = 1
+
+
+class CalendarQueue(object):
+    def __init__(self, integer_time=False):
+        """
+        calendar queue of events, see Brown (1988). The events are sorted into buckets by time like the days of a
+        year, the queue is served from the bucket of the current day. The number of buckets and the bucket width are
+        adapted to the number of events and their spacing
+        :param integer_time: if True, the event times are integer ticks
+
+        Key for the entries
+            0: time
+            1: priority
+            2: event counter
+            3: callback
+            4: arguments
+        """
+        self.integer_time = integer_time
+        self.width = 1
+        self.number_of_buckets = 2
+        self.buckets = [list() for _ in range(self.number_of_buckets)]
+        self.current = 0  # bucket number of the current day, counted from time zero
+        self.last_time = 0  # time of the last served entry
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def bucket(self, time):
+        return int(time / self.width)
+
+    def push(self, entry):
+        """
+        add an entry, the time is not before the last served entry
+        :param entry: tuple with the event attributes
+        :return: void
+        """
+        insort(self.buckets[self.bucket(entry[0]) % self.number_of_buckets], entry)
+        self.size += 1
+        if self.size > 2 * self.number_of_buckets:
+            self.resize(number_of_buckets=2 * self.number_of_buckets)
+        return
+
+    def pop(self):
+        """
+        remove the first entry, ordered by time, priority and event counter
+        :return: entry or None if the queue is empty
+        """
+        if self.size == 0:
+            return None
+
+        # search the days of one year, starting at the current day
+        for _ in range(self.number_of_buckets):
+            bucket = self.buckets[self.current % self.number_of_buckets]
+            if bucket and self.bucket(bucket[0][0]) == self.current:
+                return self.take(bucket=bucket)
+            self.current += 1
+
+        # no entry within a year, jump to the first entry
+        first = min(bucket[0] for bucket in self.buckets if bucket)
+        self.current = self.bucket(first[0])
+        return self.take(bucket=self.buckets[self.current % self.number_of_buckets])
+
+    def take(self, bucket):
+        entry = bucket.pop(0)
+        self.size -= 1
+        self.last_time = entry[0]
+        if self.number_of_buckets > 2 and self.size < self.number_of_buckets // 2:
+            self.resize(number_of_buckets=self.number_of_buckets // 2)
+        return entry
+
+    def resize(self, number_of_buckets):
+        """
+        rebuild the calendar with a new number of buckets and a bucket width of three times the mean spacing of the
+        first entries
+        :param number_of_buckets: new number of buckets
+        :return: void
+        """
+        entries = [entry for bucket in self.buckets for entry in bucket]
+        sample = nsmallest(25, entries)
+        spacing = [later[0] - earlier[0] for earlier, later in zip(sample, sample[1:]) if later[0] > earlier[0]]
+        if spacing:
+            self.width = 3 * sum(spacing) / len(spacing)
+            if self.integer_time:
+                self.width = max(1, round(self.width))
+
+        self.number_of_buckets = number_of_buckets
+        self.buckets = [list() for _ in range(self.number_of_buckets)]
+        for entry in entries:
+            self.buckets[self.bucket(entry[0]) % self.number_of_buckets].append(entry)
+        for bucket in self.buckets:
+            bucket.sort()
+        self.current = self.bucket(self.last_time)
+        return
+
+
+class CalendarEnvironment(object):
+    def __init__(self, tick=None):
+        """
+        discrete-event engine with a calendar queue. The events are callbacks of the model instead of SimPy processes
+        and are served in the same order as by SimPy: by time, the start of a process first and otherwise in order of
+        scheduling
+        :param tick: length of a time step, if not None the time is counted in integer steps. Only for fixed-step
+                     models, the delays are rounded to whole steps
+        """
+        self.tick = tick
+        self.queue = CalendarQueue(integer_time=tick is not None)
+        self.time = 0  # in steps if tick is not None
+        self.counter = 0
+        self.stopped = False
+
+    @property
+    def now(self):
+        if self.tick is None:
+            return self.time
+        return self.time * self.tick
+
+    def schedule(self, delay, callback, args=(), priority=NORMAL):
+        """
+        schedule a callback
+        :param delay: time until the event
+        :param callback: function called at the event
+        :param args: tuple with the arguments of the callback
+        :param priority: URGENT or NORMAL
+        :return: void
+        """
+        if self.tick is None:
+            time = self.time + delay
+        else:
+            time = self.time + round(delay / self.tick)
+        self.queue.push((time, priority, self.counter, callback, args))
+        self.counter += 1
+        return
+
+    def start(self, callback, args=()):
+        """
+        schedule a callback at the current time before the other events, the counterpart of starting a SimPy process
+        :param callback: function called at the event
+        :param args: tuple with the arguments of the callback
+        :return: void
+        """
+        self.schedule(0, callback, args=args, priority=URGENT)
+        return
+
+    def stop(self):
+        self.stopped = True
+        return
+
+    def run(self, until=None):
+        """
+        serve the events until the queue is empty, the engine is stopped or the time until is reached
+        :param until: end time, None to run until stopped
+        :return: void
+        """
+        if until is not None:
+            if self.tick is None:
+                time = self.time + (until - self.now)
+            else:
+                time = math.ceil(until / self.tick)
+            self.queue.push((time, URGENT, self.counter, self.stop, ()))
+            self.counter += 1
+
+        self.stopped = False
+        while not self.stopped:
+            entry = self.queue.pop()
+            if entry is None:
+                break
+            self.time = entry[0]
+            entry[3](*entry[4])
+        return
+
+
+class Machine(object):
+    def __init__(self, env, capacity=1):
+        """
+        capacity source of the calendar engine, the counterpart of the SimPy PriorityResource. Waiting requests are
+        granted in order of priority and time of the request, a slot that is released is granted by a separate event
+        :param env: CalendarEnvironment object
+        :param capacity: number of usage slots
+        """
+        self.env = env
+        self.capacity = capacity
+        self.users = list()
+        self.queue = list()
+        self.counter = 0
+
+    def request(self, user, priority, callback, args=()):
+        """
+        request a usage slot, the callback is scheduled once the slot is granted
+        :param user: object using the slot
+        :param priority: lower values are granted first
+        :param callback: function called when the slot is granted
+        :param args: tuple with the arguments of the callback
+        :return: void
+        """
+        insort(self.queue, (priority, self.env.now, self.counter, user, callback, args))
+        self.counter += 1
+        self.grant()
+        return
+
+    def release(self, user):
+        """
+        release the usage slot of a user
+        :param user: object using the slot
+        :return: void
+        """
+        self.users.remove(user)
+        self.env.schedule(0, self.grant)
+        return
+
+    def grant(self):
+        # only the first waiting request is considered, as by SimPy
+        if self.queue and len(self.users) < self.capacity:
+            _, _, _, user, callback, args = self.queue.pop(0)
+            self.users.append(user)
+            self.env.schedule(0, callback, args=args)
+        return
@@ -0,0 +1,117 @@
+"""
+Project: ProcessSim
+Made By: Arno Kasper
+Version: 1.0.0
+"""
+import json
+import os
+import pandas as pd
+
+from resultcache import plain_value
+
+
+def read_records(file):
+    """
+    read the records of a checkpoint file, an incomplete last record from an interrupted write is left out
+    :param file: checkpoint file
+    :return: list with the records
+    """
+    records = list()
+    if not os.path.exists(file):
+        return records
+    with open(file, "r") as checkpoint:
+        for line in checkpoint:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return records
+
+
+def write_records(file, records, mode="a"):
+    """
+    write records to a checkpoint file and wait until they are on disk
+    :param file: checkpoint file
+    :param records: list with the records
+    :param mode: "a" to append, "w" to replace the file
+    :return: void
+    """
+    with open(file, mode) as checkpoint:
+        for record in records:
+            checkpoint.write(json.dumps(record, default=plain_value) + "\n")
+        checkpoint.flush()
+        os.fsync(checkpoint.fileno())
+    return
+
+
+class RunCheckpoint(object):
+    def __init__(self, file, resume=False):
+        """
+        file with a record for each finished run of an experiment, each record is on disk before the simulation
+        continues. Runs of a single simulation depend on the previous runs and can not be resumed, independent
+        replications can
+        :param file: checkpoint file of the experiment
+        :param resume: if True, keep the records of the previous attempt
+        """
+        self.file = file
+        self.records = list()
+        if resume:
+            self.records = read_records(file=self.file)
+        # start with the complete records only
+        write_records(file=self.file, records=self.records, mode="w")
+
+    def write_run(self, run):
+        """
+        :param run: dictionary with the measures of the run
+        :return: void
+        """
+        write_records(file=self.file, records=[{"run": run}])
+        return
+
+    def write_replication(self, result):
+        """
+        :param result: run database, order input counter, order output counter of an independent replication
+        :return: void
+        """
+        database, order_input_counter, order_output_counter = result
+        write_records(file=self.file, records=[{"run": run,
+                                                "order_input_counter": order_input_counter,
+                                                "order_output_counter": order_output_counter}
+                                               for run in database.to_dict(orient="records")])
+        return
+
+    def finished_replications(self):
+        """
+        :return: dictionary with the result of each finished independent replication
+        """
+        finished = dict()
+        for record in self.records:
+            if "order_input_counter" in record:
+                finished[record["run"]["run"]] = (pd.DataFrame([record["run"]]),
+                                                  record["order_input_counter"],
+                                                  record["order_output_counter"])
+        return finished
+
+
+class CompletionJournal(object):
+    def __init__(self, file):
+        """
+        journal with a record for each experiment of which the results are saved
+        :param file: journal file, shared by the experiments
+        """
+        self.file = file
+
+    def finished(self):
+        """
+        :return: set with the finished experiment numbers
+        """
+        return {record["exp_number"] for record in read_records(file=self.file)}
+
+    def write(self, exp_number, experiment_name):
+        """
+        :param exp_number: the experiment number
+        :param experiment_name: name of the experiment
+        :return: void
+        """
+        write_records(file=self.file, records=[{"exp_number": exp_number, "experiment_name": experiment_name}])
+        return
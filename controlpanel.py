@@ -6,17 +6,26 @@ Version: 1.0.0
 from typing import cast, Dict, List, Optional, Tuple, Type, Generator, ClassVar
 from generalfunctions import GeneralFunctions
 import exp_paramaters as parameters
-from simpy import FilterStore, PriorityResource
+from simpy import PriorityResource
+from calendarqueue import CalendarEnvironment, Machine
+from orderqueue import OrderQueue, OrderPool
 
 
 class ModelPanel(object):
-    def __init__(self, experiment_number: int, simulation: ClassVar) -> None:
+    def __init__(self, experiment_number: int, simulation: ClassVar, settings: Optional[Dict[str, any]] = None) -> None:
+        """
+        :param experiment_number: the experiment number
+        :param simulation: simulation object
+        :param settings: dictionary with settings that replace the defaults below, applied before the manufacturing
+                         floor is built
+        """
         self.experiment_number: int = experiment_number
         self.sim: ClassVar = simulation
         self.print_info: bool = True
-        self.params_list: List[...] = parameters.experimental_params_list[self.experiment_number]
+        self.experiment_spec: parameters.ExperimentSpec = parameters.experimental_grid[self.experiment_number]
         self.project_name: str = "Thesis"
-        self.experiment_name: str = f"{self.params_list[5]}_{self.params_list[4]}_{self.params_list[3]}_{self.params_list[2]}"
+        self.experiment_name: str = f"{self.experiment_spec.name}_{self.experiment_spec.dispatching_rule}_" \
+                                    f"{self.experiment_spec.routing_direction}_{self.experiment_spec.alpha}"
         self.general_functions: GeneralFunctions = GeneralFunctions(simulation=self.sim)
 
         # general variables and experimental factors
@@ -25,21 +34,54 @@ class ModelPanel(object):
         self.RUN_TIME: int = 10000         # run time simulation model
         self.NUMBER_OF_RUNS: int = 1#00     # number of replications
 
+        # discrete-event engine
+        """
+        Options for the discrete-event engine
+            - simpy:    SimPy environment with a process for each operation
+            - calendar: calendar queue that drives the model through callbacks, gives the same results as simpy
+        """
+        self.SIMULATION_ENGINE: str = "simpy"
+        self.CALENDAR_TICK: Optional[float] = None  # integer time steps of the calendar queue, for fixed-step models
+        self.INSTRUMENTATION: bool = False  # wall time of the subsystems and event counters, reported after a simulation
+        self.INSTRUMENTATION_FILE: Optional[str] = None  # JSON lines file for the reports, printed if None
+
+        # warm-up detection
+        """
+        Options for the detection of the warm-up period from a pilot run, replaces WARM_UP_PERIOD
+            - None:     fixed WARM_UP_PERIOD
+            - MSER-5:   Marginal Standard Error Rule on batch means of five observations
+        Time series of the pilot run
+            - throughput_time:  throughput time of the orders in order of finishing
+            - WIP:              number of orders in the system, sampled each WARM_UP_SAMPLE_INTERVAL
+        """
+        self.WARM_UP_DETECTION: Optional[str] = None
+        self.WARM_UP_SERIES: str = "throughput_time"
+        self.WARM_UP_PILOT_TIME: int = 20000  # run time of the pilot run
+        self.WARM_UP_SAMPLE_INTERVAL: float = 10
+        self.SEQUENTIAL_STOPPING: bool = False  # continue replications until the stopping criterion is met
+        self.SEQUENTIAL_MEASURES: List[str] = ["mean_throughput_time"]  # measures for the stopping criterion
+        self.RELATIVE_HALF_WIDTH: float = 0.01  # relative half-width of the confidence interval to reach
+        self.CONFIDENCE_LEVEL: float = 0.95
+        self.MIN_NUMBER_OF_RUNS: int = 5
+        self.MAX_NUMBER_OF_RUNS: int = 1000
+        self.WALL_CLOCK_BUDGET: Optional[float] = None  # maximum seconds of simulation for the replications
+        self.INDEPENDENT_REPLICATIONS: bool = False  # run each replication as a separately seeded simulation
+        self.REPLICATION_WORKERS: int = 1  # number of worker processes for independent replications
+
+        # variance reduction for independent replications
+        self.ANTITHETIC_REPLICATIONS: bool = False  # pairs of runs with complementary uniforms, requires VARIATE_STREAMS
+        self.CONTROL_VARIATES: bool = False  # adjust with realised utilization and mean process time
+        self.VARIANCE_REDUCTION_MEASURES: List[str] = ["mean_throughput_time",
+                                                       "mean_process_throughput_time",
+                                                       "mean_lateness",
+                                                       "mean_tardiness",
+                                                       "percentage_tardy"]
+
         # Manufacturing process and order characteristics---------------------------------------------------------------
         self.NUMBER_OF_WORKCENTRES: int = 6
-        self.MANUFACTURING_FLOOR_LAYOUT: List[str, ...] = []
-        for i in range(0, self.NUMBER_OF_WORKCENTRES):
-            self.MANUFACTURING_FLOOR_LAYOUT.append(f'WC{i}')
-
-        self.ORDER_POOL: FilterStore = FilterStore(self.sim.env)
-        self.ORDER_QUEUES: Dict[...] = {}
-        self.MANUFACTURING_FLOOR: Dict[...] = {}  # The manufacturing floor floor
         self.NUMBER_OF_MACHINES: int = 1
-
-        for i, WorkCentre in enumerate(self.MANUFACTURING_FLOOR_LAYOUT):
-            self.ORDER_QUEUES[WorkCentre]: FilterStore = FilterStore(self.sim.env)
-            self.MANUFACTURING_FLOOR[WorkCentre]: PriorityResource = \
-                PriorityResource(self.sim.env, capacity=self.NUMBER_OF_MACHINES)
+        self.MAX_ROUTING_LENGTH: Optional[int] = None  # maximum number of work centres of a GFS or RJS routing
+        self.LARGE_SHOP: bool = False  # sparse order data, the cost of an order scales with its routing length
 
         # Manufacturing model configuration
         """
@@ -49,7 +91,7 @@ class ModelPanel(object):
             3. PFS: pure flow shop
             4. PJS: pure job shop 
         """
-        self.WC_AND_FLOW_CONFIGURATION: str = self.params_list[3] # 'GFS' # 'RJS' #
+        self.WC_AND_FLOW_CONFIGURATION: str = self.experiment_spec.routing_direction # 'GFS' # 'RJS' #
 
         # process and arrival times
         """
@@ -65,9 +107,75 @@ class ModelPanel(object):
         self.MEAN_PROCESS_TIME: int = 1  # mean process time for this simulation
         self.STD_DEV_PROCESS_TIME: float = 0.5  # Standard deviation for this simulation
         self.TRUNCATION_POINT_PROCESS_TIME: any = 4 # "inf" #  # Truncation point process time
+
+        # draw arrivals, process times and routings from buffered numpy streams instead of random.Random
+        self.VARIATE_STREAMS: bool = False
+        self.VARIATE_BLOCK_SIZE: int = 4096  # number of random values generated at once
+
+        # Activate the appropriate data collection methods -------------------------------------------------------------
+        self.COLLECT_BASIC_DATA: bool = True
+        self.COLLECT_STATION_DATA: bool = False
+        self.COLLECT_ORDER_DATA: bool = False
+        self.SUMMARY_DATA_ONLY: bool = False  # running mean and variance of the measures, no record for each order
+        self.ORDER_TRACE: bool = False  # binary trace with the lifecycle of each finished order, see ordertrace.py
+        self.ORDER_TRACE_FILE: str = "order_trace.bin"  # independent replications add _rep<number> to the name
+
+        # saving the run data of the experiments
+        """
+        Options for the results format
+            - csv:      a csv file for each experiment
+            - xlsx:     an excel file for each experiment
+            - sqlite:   a SQLite file for the project with a row for each run, written by a background thread
+        """
+        self.RESULTS_FORMAT: str = "csv"
+        self.RESULTS_CACHE: bool = False  # reuse the results of experiments with the same settings, seed and code
+        self.RESULTS_CACHE_DIRECTORY: str = "results_cache"
+        self.RESULTS_CACHE_SIZE: float = 1024  # maximum size of the cache in megabytes
+        self.CHECKPOINT_RUNS: bool = False  # write each finished run to disk and keep a journal of saved experiments
+        self.CHECKPOINT_DIRECTORY: str = "checkpoints"
+        self.RESUME: bool = False  # skip the saved experiments and the finished independent replications
+
+        # Control how the model is used
+        self.EXPERIMENT_MANAGER: bool = True
+        self.NON_STATIONARY_CONTROL: bool = False
+        self.CUSTOM_CONTROL: bool = True
+
+        # replace the defaults and build the manufacturing floor
+        if settings is not None:
+            for name, value in settings.items():
+                setattr(self, name, value)
+        self.build_manufacturing_floor()
+
+    def build_manufacturing_floor(self) -> None:
+        """
+        make the work centres, queues and capacity sources and the arrival rate from the settings
+        :return: void
+        """
+        if self.SIMULATION_ENGINE == "calendar":
+            self.sim.env = CalendarEnvironment(tick=self.CALENDAR_TICK)
+        elif self.SIMULATION_ENGINE != "simpy":
+            raise Exception("Please indicate an allowed simulation engine")
+
+        self.WORK_CENTRES: List[int] = [*range(0, self.NUMBER_OF_WORKCENTRES)]  # work centre ids used by the model
+        self.MANUFACTURING_FLOOR_LAYOUT: List[str, ...] = []  # work centre names, used for reporting
+        self.WORK_CENTRE_INDEX: Dict[str, int] = {}  # work centre id of each name
+        for i in self.WORK_CENTRES:
+            self.MANUFACTURING_FLOOR_LAYOUT.append(f'WC{i}')
+            self.WORK_CENTRE_INDEX[f'WC{i}'] = i
+
+        self.ORDER_POOL: OrderPool = OrderPool()
+        self.ORDER_QUEUES: List[OrderQueue] = []  # indexed by work centre id
+        self.MANUFACTURING_FLOOR: List[any] = []  # The manufacturing floor floor
+
+        for WC in self.WORK_CENTRES:
+            self.ORDER_QUEUES.append(OrderQueue())
+            if self.SIMULATION_ENGINE == "calendar":
+                self.MANUFACTURING_FLOOR.append(Machine(self.sim.env, capacity=self.NUMBER_OF_MACHINES))
+            else:
+                self.MANUFACTURING_FLOOR.append(PriorityResource(self.sim.env, capacity=self.NUMBER_OF_MACHINES))
+
         # Calculate mean time between arrival
         # (mean amount of machines/amount of machines/utilization * 1 / amount of machines)
-
         self.MEAN_TIME_BETWEEN_ARRIVAL: float = \
             self.general_functions.arrival_time_calculator(
                       wc_and_flow_config=self.WC_AND_FLOW_CONFIGURATION,
@@ -75,30 +183,23 @@ class ModelPanel(object):
                       aimed_utilization=self.AIMED_UTILIZATION,
                       mean_process_time=self.MEAN_PROCESS_TIME,
                       number_of_machines=self.NUMBER_OF_MACHINES,
+                      maximum_routing_length=self.MAX_ROUTING_LENGTH,
                       cv=1)
 
         # Used for workload calculations
-        self.PROCESSED: Dict[str, float] = {}  # Keeps record of the processed orders/load
-        self.RELEASED: Dict[str, float] = {}  # Keeps record of the released orders/load
-
-        for WC in self.MANUFACTURING_FLOOR_LAYOUT:
-            self.PROCESSED[WC] = 0.0
-            self.RELEASED[WC] = 0.0
+        self.PROCESSED: List[float] = [0.0] * self.NUMBER_OF_WORKCENTRES  # Keeps record of the processed orders/load
+        self.RELEASED: List[float] = [0.0] * self.NUMBER_OF_WORKCENTRES  # Keeps record of the released orders/load
+        return
 
-        # Activate the appropriate data collection methods -------------------------------------------------------------
-        self.COLLECT_BASIC_DATA: bool = True
-        self.COLLECT_STATION_DATA: bool = False
-        self.COLLECT_ORDER_DATA: bool = False
-
-        # Control how the model is used
-        self.EXPERIMENT_MANAGER: bool = True
-        self.NON_STATIONARY_CONTROL: bool = False
-        self.CUSTOM_CONTROL: bool = True
 
 class PolicyPanel(object):
-    def __init__(self, experiment_number: int) -> None:
+    def __init__(self, experiment_number: int, settings: Optional[Dict[str, any]] = None) -> None:
+        """
+        :param experiment_number: the experiment number
+        :param settings: dictionary with settings that replace the defaults below
+        """
         self.experiment_number: int = experiment_number
-        self.params_list: List[...] = parameters.experimental_params_list[self.experiment_number]
+        self.experiment_spec: parameters.ExperimentSpec = parameters.experimental_grid[self.experiment_number]
 
         # customer enquiry management - Due Date determination ---------------------------------------------------------
         """
@@ -143,7 +244,7 @@ class PolicyPanel(object):
         self.PRD_k: int = 6  # Factor K for PRD calculations
 
         # release control method
-        self.release_control: bool = False #self.params_list[0]
+        self.release_control: bool = False #self.experiment_spec.order_release
         self.release_norm: float = 5
         self.release_control_method: str = "LUMS_COR"
 
@@ -161,5 +262,10 @@ class PolicyPanel(object):
             - MODD
         """
         # Dispatching rules
-        self.dispatching_rule: str = "SPT" #self.params_list[4]  #"MODD" #"ODD_land"  # "SPT"
+        self.dispatching_rule: str = "SPT" #self.experiment_spec.dispatching_rule  #"MODD" #"ODD_land"  # "SPT"
         self.ODD_k: int = 7
+
+        # replace the defaults
+        if settings is not None:
+            for name, value in settings.items():
+                setattr(self, name, value)
@@ -7,6 +7,15 @@ class CustomizedSettings(object):
         self.sim = simulation
 
     def add_additional_measures(self, df_run):
+        """
+        Define additional measures of a run, each column is a measure
+            - return a single row with the value of each measure, without a row the measures are NaN
+            - df_run has a row for each order of the run
+            - with SUMMARY_DATA_ONLY there are no order records, df_run has the rows count, mean and variance with the
+              running statistics of the columns instead
+        :param df_run: dataframe with the data of the run
+        :return: dataframe with the additional measures
+        """
         df_additional_measures = pd.DataFrame([])
         return df_additional_measures
 
@@ -28,14 +37,16 @@ class CustomizedSettings(object):
         """
         return None
 
-    def dispatching_mode(self, queue_list):
+    def dispatching_mode(self, queue_list, work_centre):
         """
         Define customized version of queue priority. Dynamic updating
-            - if return is None, the default is used as specified in the control panel
-        :param queue_list: list with all orders in the queue
-        :return: updated queue_list
+            - if changed is False, the default is used as specified in the control panel
+        :param queue_list: sequence with all queue items in order of entering the queue, the snapshot is made
+                           on first use. It can be changed and sorted like a list, it is not a list object itself
+        :param work_centre: work centre id of the queue
+        :return: updated queue_list, bool: changed
         """
-        return None
+        return queue_list, False
 
     def due_date(self, order):
         """
@@ -4,8 +4,163 @@ Made By: Arno Kasper
 Version: 1.0.0
 """
 from typing import cast, Dict, List, Optional, Tuple, Type, Generator
+from scipy import stats
+import numpy as np
 import pandas as pd
 
+class RunningStatistics(object):
+    def __init__(self):
+        """
+        mean and variance updated one observation at a time (Welford)
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.sum_squares = 0.0
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.sum_squares += delta * (value - self.mean)
+        return
+
+    def sample_mean(self):
+        if self.count == 0:
+            return np.nan
+        return self.mean
+
+    def variance(self):
+        if self.count < 2:
+            return np.nan
+        return self.sum_squares / (self.count - 1)
+
+    def relative_half_width(self, confidence_level):
+        """
+        half-width of the t confidence interval of the mean relative to the mean
+        :param confidence_level: confidence level of the interval
+        :return: relative half-width
+        """
+        if self.count < 2 or self.mean == 0:
+            return np.inf
+        half_width = stats.t.ppf(1 - (1 - confidence_level) / 2, df=self.count - 1) * \
+                     np.sqrt(self.variance() / self.count)
+        return half_width / abs(self.mean)
+
+
+class RecordBuffer(object):
+    def __init__(self, number_of_columns, capacity=1024):
+        """
+        growable array with a record (row) for each order. Records are written in place and the columns are
+        handed out as views without copying
+        :param number_of_columns: number of columns of each record
+        :param capacity: initial number of records
+        """
+        self.data = np.full((capacity, number_of_columns), np.nan)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def new_record(self):
+        """
+        reserve the next record, the values are NaN
+        :return: array view of the record
+        """
+        if self.size == self.data.shape[0]:
+            data = np.full((2 * self.data.shape[0], self.data.shape[1]), np.nan)
+            data[:self.size] = self.data
+            self.data = data
+        record = self.data[self.size]
+        self.size += 1
+        return record
+
+    def append(self, record):
+        self.new_record()[:] = record
+        return
+
+    def view(self):
+        """
+        :return: array view of the written records
+        """
+        return self.data[:self.size]
+
+    def column(self, index):
+        """
+        :param index: column index
+        :return: array view of the column of the written records
+        """
+        return self.data[:self.size, index]
+
+
+class RunStore(object):
+    def __init__(self, capacity=64):
+        """
+        column store with a row for each run. The columns are arrays with spare capacity, a dataframe is only made
+        on demand. The columns keep the order in which they were first stored
+        :param capacity: initial number of rows
+        """
+        self.capacity = capacity
+        self.columns = dict()
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, row):
+        """
+        add a row, columns that are missing in the row are NaN
+        :param row: dictionary with the value of each column
+        :return: void
+        """
+        if self.size == self.capacity:
+            self.capacity *= 2
+            for name, column in self.columns.items():
+                self.columns[name] = np.resize(column, self.capacity)
+
+        for name, value in row.items():
+            value_type = np.asarray(value).dtype
+            if value_type.kind not in "biuf":
+                value_type = np.dtype(object)
+            column = self.columns.get(name)
+            if column is None:
+                column = np.empty(self.capacity, dtype=value_type)
+                if self.size > 0:
+                    # new column, the previous rows are NaN
+                    column = np.full(self.capacity, np.nan, dtype=np.result_type(value_type, float))
+            elif not np.can_cast(value_type, column.dtype, casting="safe"):
+                column = column.astype(np.result_type(column.dtype, value_type))
+            column[self.size] = value
+            self.columns[name] = column
+
+        for name, column in self.columns.items():
+            if name not in row:
+                if not np.can_cast(float, column.dtype, casting="safe"):
+                    column = column.astype(np.result_type(column.dtype, float))
+                    self.columns[name] = column
+                column[self.size] = np.nan
+        self.size += 1
+        return
+
+    def append_frame(self, df):
+        """
+        add the rows of a dataframe
+        :param df: dataframe with a row for each run
+        :return: void
+        """
+        for row in df.to_dict(orient="records"):
+            self.append(row=row)
+        return
+
+    def frame(self, start=0):
+        """
+        :param start: index of the first row
+        :return: dataframe with the rows from start onwards
+        """
+        if self.size == 0:
+            return None
+        return pd.DataFrame({name: column[start:self.size].copy() for name, column in self.columns.items()})
+
+
 class DataStorageRun(object):
     def __init__(self, sim):
         self.sim = sim
@@ -13,14 +168,25 @@ class DataStorageRun(object):
         # General data
         self.run_number = list()
         self.accumulated_process_time = 0
+        self.operation_counter = 0
 
         # old variables, still required?
         self.ContLUMSCORCounter = 0
         self.order_input_counter = 0
         self.order_output_counter = 0
 
-        # order data
-        self.order_list = list()
+        # order data, either a record for each order or the running statistics of each column
+        self.order_records = None
+        self.order_statistics = None
+        if self.sim.model_panel.SUMMARY_DATA_ONLY:
+            self.order_statistics = [RunningStatistics() for _ in self.sim.data_collection.columns_names_run]
+        else:
+            self.order_records = RecordBuffer(number_of_columns=len(self.sim.data_collection.columns_names_run))
+
+        # station data of a large shop, running statistics that are only updated for the visited work centres
+        self.station_statistics = None
+        if self.sim.model_panel.LARGE_SHOP and self.sim.model_panel.COLLECT_STATION_DATA:
+            self.station_statistics = [RunningStatistics() for _ in self.sim.model_panel.WORK_CENTRES]
 
 class DataStorageExp(object):
     def __init__(self, sim):
@@ -30,8 +196,18 @@ class DataStorageExp(object):
         self.order_input_counter = 0
         self.order_output_counter = 0
 
-        # pandas dataframe
-        self.database = None
+        # run data, use the database property for a pandas dataframe
+        self.runs = RunStore()
+        self.variance_reduction = None
+
+        # replication statistics of the measures
+        self.replication_statistics = {"mean_throughput_time": RunningStatistics()}
+        for measure in self.sim.model_panel.SEQUENTIAL_MEASURES:
+            self.replication_statistics[measure] = RunningStatistics()
+
+    @property
+    def database(self):
+        return self.runs.frame()
 
 class DataCollection(object):
     def __init__(self, simulation):
@@ -48,14 +224,30 @@ class DataCollection(object):
                             "tardy",
                             ]
 
-        # add work centre info if required
-        if self.sim.model_panel.COLLECT_STATION_DATA:
+        # add work centre info if required, a large shop keeps the station data apart from the order records
+        if self.sim.model_panel.COLLECT_STATION_DATA and not self.sim.model_panel.LARGE_SHOP:
             for i, _ in enumerate(self.sim.model_panel.MANUFACTURING_FLOOR_LAYOUT):
                 self.columns_names_run.append(f"queue_time_wc{i}")
 
-    def append_run_list(self, result_list):
-        self.sim.data_run.order_list.append(result_list)
-        return
+    def summary_frame(self):
+        """
+        :return: dataframe with the count, mean and variance of each column of the run, from the running statistics
+        """
+        statistics = self.sim.data_run.order_statistics
+        return pd.DataFrame([[column.count for column in statistics],
+                             [column.sample_mean() for column in statistics],
+                             [column.variance() for column in statistics]],
+                            index=["count", "mean", "variance"], columns=self.columns_names_run)
+
+    def column_mean(self, df_run, column):
+        if self.sim.model_panel.SUMMARY_DATA_ONLY:
+            return self.sim.data_run.order_statistics[self.columns_names_run.index(column)].sample_mean()
+        return df_run.loc[:, column].mean()
+
+    def column_variance(self, df_run, column):
+        if self.sim.model_panel.SUMMARY_DATA_ONLY:
+            return self.sim.data_run.order_statistics[self.columns_names_run.index(column)].variance()
+        return df_run.loc[:, column].var()
 
     def run_update(self, warmup):
         if not warmup:
@@ -66,49 +258,124 @@ class DataCollection(object):
         self.sim.data_run = DataStorageRun(sim=self.sim)
         return
 
+    def update_replication_statistics(self, run):
+        """
+        add the measures of a run to the replication statistics
+        :param run: dictionary or series with the measures of the run
+        :return: void
+        """
+        for measure, statistics in self.sim.data_exp.replication_statistics.items():
+            statistics.update(run[measure])
+        return
+
+    def variance_reduction_estimates(self):
+        """
+        estimate the mean of the measures over the runs with variance reduction. Antithetic pairs of runs are
+        averaged first. Control variates adjust the mean by regressing the measure on the realised utilization and
+        mean process time minus their known means
+        :return: dataframe with the estimators and the variance of the estimators
+        """
+        runs = self.sim.data_exp.database
+        if self.sim.model_panel.ANTITHETIC_REPLICATIONS:
+            runs = runs.groupby((runs["run"] + 1) // 2).mean()
+        number_of_runs = runs.shape[0]
+
+        # controls with known mean
+        controls = [np.ones(number_of_runs)]
+        if self.sim.model_panel.CONTROL_VARIATES:
+            controls.append(runs["utilization"].to_numpy() - self.sim.model_panel.AIMED_UTILIZATION * 100)
+            controls.append(runs["mean_operation_process_time"].to_numpy() - self.sim.model_panel.MEAN_PROCESS_TIME)
+        x = np.column_stack(controls)
+        degrees_of_freedom = number_of_runs - x.shape[1]
+
+        estimates = list()
+        for measure in self.sim.model_panel.VARIANCE_REDUCTION_MEASURES:
+            y = runs[measure].to_numpy()
+            mean = y.mean()
+            var_mean = y.var(ddof=1) / number_of_runs
+
+            # the intercept of the regression is the adjusted estimator
+            adjusted_mean, var_adjusted_mean = np.nan, np.nan
+            if degrees_of_freedom > 0:
+                coefficients = np.linalg.lstsq(x, y, rcond=None)[0]
+                residuals = y - x @ coefficients
+                adjusted_mean = coefficients[0]
+                var_adjusted_mean = (residuals @ residuals / degrees_of_freedom) * np.linalg.pinv(x.T @ x)[0, 0]
+            estimates.append([measure, number_of_runs, mean, var_mean, adjusted_mean, var_adjusted_mean])
+
+        return pd.DataFrame(estimates, columns=["measure",
+                                                "number_of_runs",
+                                                "mean",
+                                                "var_mean",
+                                                "adjusted_mean",
+                                                "var_adjusted_mean"])
+
     def store_run_data(self):
-        # put all data into dataframe
-        df_run = pd.DataFrame(self.sim.data_run.order_list)
-        df_run.columns = self.columns_names_run
+        # put all data into dataframe, without records only the running statistics are available
+        if self.sim.model_panel.SUMMARY_DATA_ONLY:
+            df_run = self.summary_frame()
+            number_of_orders = self.sim.data_run.order_statistics[1].count
+        else:
+            df_run = pd.DataFrame(self.sim.data_run.order_records.view(), columns=self.columns_names_run, copy=False)
+            number_of_orders = df_run.shape[0]
 
-        # dataframe for each run
-        df = pd.DataFrame(
-            [(int(self.sim.env.now / (self.sim.model_panel.WARM_UP_PERIOD + self.sim.model_panel.RUN_TIME)))],
-            columns=['run'])
+        # measures of the run
+        run = {"run": int(self.sim.env.now / (self.sim.model_panel.WARM_UP_PERIOD + self.sim.model_panel.RUN_TIME))}
 
         if self.sim.model_panel.COLLECT_BASIC_DATA and not self.sim.model_panel.COLLECT_ORDER_DATA:
-            df["nr_flow_items"] = df_run.shape[0]
+            run["nr_flow_items"] = number_of_orders
             number_of_machines_in_process = (
                         self.sim.model_panel.NUMBER_OF_MACHINES * len(self.sim.model_panel.MANUFACTURING_FLOOR_LAYOUT))
-            df["utilization"] = ((self.sim.data_run.accumulated_process_time * 100 / number_of_machines_in_process)
+            run["utilization"] = ((self.sim.data_run.accumulated_process_time * 100 / number_of_machines_in_process)
                                  / self.sim.model_panel.RUN_TIME)
-            df["mean_throughput_time"] = df_run.loc[:, "throughput_time"].mean()
-            df["var_throughput_time"] = df_run.loc[:, "throughput_time"].var()
-            df["mean_pool_time"] = df_run.loc[:, "pool_time"].mean()
-            df["var_pool_time"] = df_run.loc[:, "pool_time"].var()
-            df["mean_process_throughput_time"] = df_run.loc[:, "process_throughput_time"].mean()
-            df["var_process_throughput_time"] = df_run.loc[:, "process_throughput_time"].var()
-            df["mean_lateness"] = df_run.loc[:, "lateness"].mean()
-            df["var_lateness"] = df_run.loc[:, "lateness"].var()
-            df["mean_tardiness"] = df_run.loc[:, "tardiness"].mean()
-            df["var_tardiness"] = df_run.loc[:, "tardiness"].var()
-            df["percentage_tardy"] = df_run.loc[:, "tardy"].sum() / df_run.shape[0]
+            run["mean_throughput_time"] = self.column_mean(df_run=df_run, column="throughput_time")
+            run["var_throughput_time"] = self.column_variance(df_run=df_run, column="throughput_time")
+            run["mean_pool_time"] = self.column_mean(df_run=df_run, column="pool_time")
+            run["var_pool_time"] = self.column_variance(df_run=df_run, column="pool_time")
+            run["mean_process_throughput_time"] = self.column_mean(df_run=df_run, column="process_throughput_time")
+            run["var_process_throughput_time"] = self.column_variance(df_run=df_run, column="process_throughput_time")
+            run["mean_lateness"] = self.column_mean(df_run=df_run, column="lateness")
+            run["var_lateness"] = self.column_variance(df_run=df_run, column="lateness")
+            run["mean_tardiness"] = self.column_mean(df_run=df_run, column="tardiness")
+            run["var_tardiness"] = self.column_variance(df_run=df_run, column="tardiness")
+            if self.sim.model_panel.SUMMARY_DATA_ONLY:
+                run["percentage_tardy"] = self.column_mean(df_run=df_run, column="tardy")
+            else:
+                run["percentage_tardy"] = df_run.loc[:, "tardy"].sum() / df_run.shape[0]
 
             if self.sim.model_panel.COLLECT_STATION_DATA:
+                station_statistics = self.sim.data_run.station_statistics
                 for i, WC in enumerate(self.sim.model_panel.MANUFACTURING_FLOOR_LAYOUT):
-                    df[f"mean_queue_time_wc{i}"] = df_run.loc[:, f"queue_time_wc{i}"].mean()
-                    df[f"var_queue_time_wc{i}"] = df_run.loc[:, f"queue_time_wc{i}"].var()
+                    if station_statistics is not None:
+                        run[f"mean_queue_time_wc{i}"] = station_statistics[i].sample_mean()
+                        run[f"var_queue_time_wc{i}"] = station_statistics[i].variance()
+                        continue
+                    run[f"mean_queue_time_wc{i}"] = self.column_mean(df_run=df_run, column=f"queue_time_wc{i}")
+                    run[f"var_queue_time_wc{i}"] = self.column_variance(df_run=df_run, column=f"queue_time_wc{i}")
+
+            if self.sim.model_panel.CONTROL_VARIATES:
+                run["mean_operation_process_time"] = (self.sim.data_run.accumulated_process_time
+                                                     / self.sim.data_run.operation_counter)
+
+            if self.sim.model_panel.WARM_UP_DETECTION is not None:
+                run["warm_up_period"] = self.sim.model_panel.WARM_UP_PERIOD
 
         if self.sim.model_panel.CUSTOM_CONTROL:
             df_extra = self.sim.customized_settings.add_additional_measures(df_run=df_run).reset_index(drop=True)
-            df = pd.concat([df, df_extra], axis=1)
+            if df_extra.shape[0] > 1:
+                raise Exception("Please indicate the additional measures of a run in a single row")
+            for name in df_extra.columns:
+                run[name] = df_extra.loc[0, name] if df_extra.shape[0] > 0 else np.nan
+
+        # update the replication statistics
+        if self.sim.model_panel.COLLECT_BASIC_DATA and not self.sim.model_panel.COLLECT_ORDER_DATA:
+            self.update_replication_statistics(run=run)
 
         # save data from the run
-        if self.sim.data_exp.database is None:
-            self.sim.data_exp.database = df
-        else:
-            self.sim.data_exp.database = pd.concat([self.sim.data_exp.database, df], ignore_index=True)
+        self.sim.data_exp.runs.append(row=run)
+        if self.sim.checkpoint is not None:
+            self.sim.checkpoint.write_run(run=run)
 
         # data processing finished. Update new run
         self.sim.data_run = DataStorageRun(sim=self.sim)
-        return
\ No newline at end of file
+        return
\ No newline at end of file
@@ -3,28 +3,53 @@ Project: ProcessSim
 Made By: Arno Kasper
 Version: 1.0.0
 """
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
 import pandas as pd
 import socket
 import random
+import traceback
 import warnings
 import os
 
 import simulationmodel as sim
+from resultstore import ResultStore
+from resultcache import ResultCache, experiment_key
+from checkpoint import RunCheckpoint, CompletionJournal
+
+
+def run_experiment(exp_number):
+    """
+    run and save a single experiment, used as task for the worker processes
+    :param exp_number: the experiment number
+    :return: exp_number, experiment name
+    """
+    experiment_manager = Experiment_Manager(exp_number, exp_number)
+    return exp_number, experiment_manager.sim.model_panel.experiment_name
 
 
 class Experiment_Manager(object):
 
     # Creat a batch of experiments with a upper an lower limit
-    def __init__(self, lower, upper):
+    def __init__(self, lower, upper, number_of_workers=1):
         """
         initialize experiments integers
         :param lower: lower boundary of the exp number
         :param upper: upper boundary of the exp number
+        :param number_of_workers: number of worker processes, experiments run one after another if 1
         """
         self.lower = lower
         self.upper = upper
+        self.number_of_workers = number_of_workers
+        self.max_in_flight = 2 * number_of_workers
         self.count_experiment = 0
-        self.exp_manager()
+        self.failed_experiments = {}
+        self.result_store = None
+
+        if self.number_of_workers > 1:
+            self.parallel_exp_manager()
+        else:
+            self.exp_manager()
 
     def exp_manager(self):
         """
@@ -35,13 +60,117 @@ class Experiment_Manager(object):
         for i in range(self.lower, (self.upper + 1)):
             # activate Simulation experiment method
             self.sim = sim.SimulationModel(i)
-            self.sim.sim_function()
+
+            # checkpoints of the runs, finished experiments and independent replications are skipped when resuming
+            journal = None
+            if self.sim.model_panel.CHECKPOINT_RUNS:
+                os.makedirs(self.sim.model_panel.CHECKPOINT_DIRECTORY, exist_ok=True)
+                journal = CompletionJournal(file=os.path.join(self.sim.model_panel.CHECKPOINT_DIRECTORY,
+                                                              "journal.jsonl"))
+                if self.sim.model_panel.RESUME and i in journal.finished():
+                    print(f"Experiment {i} skipped, finished before")
+                    continue
+                self.sim.checkpoint = RunCheckpoint(file=os.path.join(self.sim.model_panel.CHECKPOINT_DIRECTORY,
+                                                                      f"exp_{i}.jsonl"),
+                                                    resume=self.sim.model_panel.RESUME and
+                                                    self.sim.model_panel.INDEPENDENT_REPLICATIONS)
+            self.simulate()
 
             # finish the experiment by saving the data and move on to the saving function
             exp_variable_list = self.sim.model_panel.project_name
 
             # save the experiment
             self.saving_exp(exp_variable_list)
+            if journal is not None:
+                # the runs of the experiment are on disk before it is marked as finished
+                if self.result_store is not None:
+                    self.result_store.flush()
+                journal.write(exp_number=i, experiment_name=self.sim.model_panel.experiment_name)
+
+        # wait until the result store has written the runs
+        if self.result_store is not None:
+            self.result_store.close()
+            self.result_store = None
+
+    def simulate(self):
+        """
+        run the simulation of the experiment, or take the results from the cache if an experiment with the same
+        settings, seed and model code was run before
+        :return: void
+        """
+        if not self.sim.model_panel.RESULTS_CACHE:
+            self.sim.sim_function()
+            return
+
+        cache = ResultCache(directory=self.sim.model_panel.RESULTS_CACHE_DIRECTORY,
+                            max_size=self.sim.model_panel.RESULTS_CACHE_SIZE)
+        key = experiment_key(simulation=self.sim)
+        result = cache.get(key=key)
+        if result is None:
+            self.sim.sim_function()
+            cache.put(key=key, result={"database": self.sim.data_exp.database,
+                                       "order_input_counter": self.sim.data_exp.order_input_counter,
+                                       "order_output_counter": self.sim.data_exp.order_output_counter,
+                                       "variance_reduction": self.sim.data_exp.variance_reduction})
+            return
+
+        # the experiment was run before
+        if result["database"] is not None:
+            self.sim.data_exp.runs.append_frame(df=result["database"])
+        self.sim.data_exp.order_input_counter = result["order_input_counter"]
+        self.sim.data_exp.order_output_counter = result["order_output_counter"]
+        self.sim.data_exp.variance_reduction = result["variance_reduction"]
+        print(f"Experiment {self.sim.exp_number} taken from the results cache: {key}")
+        return
+
+    def parallel_exp_manager(self):
+        """
+        experiment manager that distributes the experiments over a pool of worker processes. Each experiment seeds
+        its own random generators, results do therefore not depend on the number of workers or the order of execution.
+        A failing experiment is recorded in failed_experiments and does not stop the other experiments.
+        :return: void
+        """
+        pending = list(range(self.upper, self.lower - 1, -1))
+        while len(pending) > 0:
+            in_flight = {}
+            try:
+                with ProcessPoolExecutor(max_workers=self.number_of_workers) as executor:
+                    while len(pending) > 0 or len(in_flight) > 0:
+                        # keep the amount of submitted experiments bounded
+                        while len(pending) > 0 and len(in_flight) < self.max_in_flight:
+                            exp_number = pending.pop()
+                            in_flight[executor.submit(run_experiment, exp_number)] = exp_number
+
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            exp_number = in_flight[future]
+                            try:
+                                _, exp_name = future.result()
+                            except BrokenProcessPool:
+                                raise
+                            except Exception:
+                                self.experiment_failed(exp_number=exp_number, error=traceback.format_exc())
+                            else:
+                                self.count_experiment += 1
+                                print(f"Experiment {exp_number} finished with name:    {exp_name}")
+                            del in_flight[future]
+            except BrokenProcessPool:
+                # a worker died, the experiments in flight are lost and the pool is restarted for the others
+                for exp_number in in_flight.values():
+                    self.experiment_failed(exp_number=exp_number, error="worker process terminated abruptly")
+
+        if len(self.failed_experiments) > 0:
+            print(f"Failed experiments: {sorted(self.failed_experiments)}")
+
+    def experiment_failed(self, exp_number, error):
+        """
+        register an experiment that did not finish
+        :param exp_number: the experiment number
+        :param error: description of the error
+        :return: void
+        """
+        self.failed_experiments[exp_number] = error
+        warnings.warn(f"Experiment {exp_number} failed:\n{error}", Warning)
 
     def saving_exp(self, exp_variable_list):
         """
@@ -51,7 +180,7 @@ class Experiment_Manager(object):
         """
         # initialize params
         df = self.sim.data_exp.database
-        file_version = ".csv"  # ".xlsx"#".csv"#
+        file_version = "." + self.sim.model_panel.RESULTS_FORMAT
 
         # get file directory
         path = self.get_directory()
@@ -62,14 +191,23 @@ class Experiment_Manager(object):
         # save file
         file = path + exp_name + file_version
         try:
+            # add to the result store of the project, written in the background
+            if file_version == ".sqlite":
+                if self.result_store is None:
+                    self.result_store = ResultStore(file=path + exp_variable_list + file_version)
+                self.result_store.put_frame(exp_number=self.sim.exp_number, experiment_name=exp_name, df=df)
+
             # save as csv file
-            if file_version == ".csv":
+            elif file_version == ".csv":
                 self.save_database_csv(file=file, database=df)
 
             # save as excel file
             elif file_version == ".xlsx":
                 self.save_database_xlsx(file=file, database=df)
 
+            else:
+                raise Exception("Please indicate an allowed results format")
+
         except PermissionError:
             # failed to save, make a random addition to the name to save anyway
             random_genetator = random.Random()
@@ -4,7 +4,7 @@ Made By: Arno Kasper
 Version: 1.0.0
 """
 # Get the number of experiments from the experimental settings file
-NUMBER_EXP = 100 #len(exp_dat.experimental_params_list)
+NUMBER_EXP = 100 #len(exp_dat.experimental_grid)
 MAX_NUMBER_JOBS = 1000
 EXP_PER_JOB = 1
 
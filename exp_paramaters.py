@@ -3,6 +3,167 @@ Project: ProcessSim
 Made By: Arno Kasper
 Version: 1.0.0
 """
+from math import prod
+from typing import NamedTuple
+import bisect
+
+
+class ExperimentSpec(NamedTuple):
+    order_release: bool
+    pp_02: bool
+    alpha: float
+    routing_direction: str
+    dispatching_rule: str
+    name: str
+
+
+class Block(object):
+    def __init__(self, name, factors, **fixed):
+        """
+        block of experiments with each combination of the levels of the factors. The last factor changes fastest
+        :param name: name of the experiments in the block
+        :param factors: dictionary with the levels of each factor
+        :param fixed: value of the other fields of the experiment spec
+        """
+        self.name = name
+        self.factors = {factor: tuple(levels) for factor, levels in factors.items()}
+        self.fixed = fixed
+        self.base_offset = None  # experiment number of the first experiment of the complete block
+
+        # positions of the selected levels, all levels unless the block is filtered
+        self.positions = {factor: range(len(levels)) for factor, levels in self.factors.items()}
+
+    def __len__(self):
+        return prod(len(positions) for positions in self.positions.values())
+
+    def level_positions(self, index):
+        """
+        positions of the levels of the experiment in the complete block, without enumerating the block
+        :param index: index of the experiment in the block
+        :return: list with the position of the level of each factor
+        """
+        if not 0 <= index < len(self):
+            raise IndexError("experiment index out of range")
+        level_positions = list()
+        for positions in reversed(list(self.positions.values())):
+            index, position = divmod(index, len(positions))
+            level_positions.append(positions[position])
+        level_positions.reverse()
+        return level_positions
+
+    def spec(self, index):
+        """
+        :param index: index of the experiment in the block
+        :return: experiment spec
+        """
+        values = {factor: levels[position]
+                  for (factor, levels), position in zip(self.factors.items(), self.level_positions(index))}
+        return ExperimentSpec(name=self.name, **self.fixed, **values)
+
+    def experiment_number(self, index):
+        """
+        :param index: index of the experiment in the block
+        :return: number of the experiment in the complete grid
+        """
+        number = 0
+        for levels, position in zip(self.factors.values(), self.level_positions(index)):
+            number = number * len(levels) + position
+        return self.base_offset + number
+
+    def select(self, conditions):
+        """
+        :param conditions: dictionary with a level, a collection of levels or a function of the level for each factor
+        :return: block with the experiments that meet the conditions, None if there are none
+        """
+        def allowed(value, condition):
+            if callable(condition):
+                return condition(value)
+            if isinstance(condition, (list, tuple, set, frozenset, range)):
+                return value in condition
+            return value == condition
+
+        block = Block(name=self.name, factors=self.factors, **self.fixed)
+        block.base_offset = self.base_offset
+        block.positions = dict(self.positions)
+        for factor, condition in conditions.items():
+            if factor == "name" or factor in self.fixed:
+                value = self.name if factor == "name" else self.fixed[factor]
+                if not allowed(value, condition):
+                    return None
+            elif factor in self.factors:
+                block.positions[factor] = [position for position in block.positions[factor]
+                                           if allowed(self.factors[factor][position], condition)]
+            else:
+                raise Exception(f"Please indicate a factor of the experiment grid, {factor} is unknown")
+        if len(block) == 0:
+            return None
+        return block
+
+
+class ExperimentGrid(object):
+    def __init__(self, blocks):
+        """
+        experiments defined by blocks of factors and levels. An experiment spec is made when it is indexed, the grid
+        is never enumerated
+        :param blocks: list with the blocks of experiments
+        """
+        self.blocks = blocks
+        self.offsets = list()
+        offset = 0
+        for block in self.blocks:
+            if block.base_offset is None:
+                block.base_offset = offset
+            self.offsets.append(offset)
+            offset += len(block)
+        self.size = offset
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for index in range(self.size):
+            yield self[index]
+
+    def __getitem__(self, index):
+        """
+        :param index: experiment index or slice
+        :return: experiment spec, or a list of experiment specs for a slice
+        """
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.size))]
+        block, block_index = self.locate(index=index)
+        return block.spec(index=block_index)
+
+    def locate(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("experiment index out of range")
+        i = bisect.bisect_right(self.offsets, index) - 1
+        return self.blocks[i], index - self.offsets[i]
+
+    def experiment_number(self, index):
+        """
+        :param index: experiment index in this grid
+        :return: number of the experiment in the complete grid
+        """
+        block, block_index = self.locate(index=index)
+        return block.experiment_number(index=block_index)
+
+    def experiment_numbers(self):
+        for index in range(self.size):
+            yield self.experiment_number(index=index)
+
+    def filter(self, **conditions):
+        """
+        select experiments by the levels of the factors, e.g. filter(routing_direction="GFS", alpha=lambda a: a < 0.5)
+        :param conditions: a level, a collection of levels or a function of the level for each factor
+        :return: grid with the selected experiments, experiment_number gives their number in the complete grid
+        """
+        blocks = [block.select(conditions=conditions) for block in self.blocks]
+        return ExperimentGrid(blocks=[block for block in blocks if block is not None])
+
+
 # range for each variable
 alpha = [*range(0, 101, 1)]
 alpha = [x / 100 for x in alpha]
@@ -12,31 +173,20 @@ routing_directions = ["GFS", "RJS", "PFS"]
 dispatching_rule = ["FCFS", "ODD_land", "MODD", "SPT"]
 
 
-# params
-experimental_params_list = []
-
-# IMM
-for rd_i in routing_directions:
-    for dr_i in dispatching_rule:
-        params_list = []
-        params_list.append(False)  # order release
-        params_list.append(False)  # pp_02 off
-        params_list.append(0)      # alpha
-        params_list.append(rd_i)   # routing direction
-        params_list.append(dr_i)   # dispatching_rule
-        params_list.append("Immediate-release")
-        experimental_params_list.append(params_list)
-
-# PP_02
-for alpha_i in alpha:
-    for rd_i in routing_directions:
-        params_list = []
-        params_list.append(False)       # order release
-        params_list.append(True)        # pp_02 on
-        params_list.append(alpha_i)     # alpha
-        params_list.append(rd_i)        # routing direction
-        params_list.append("FCFS")        # dispatching_rule
-        params_list.append("ThesisProject")
-        experimental_params_list.append(params_list)
-
-print(len(experimental_params_list))
\ No newline at end of file
+# experiments
+experimental_grid = ExperimentGrid(blocks=[
+    # IMM
+    Block(name="Immediate-release",
+          factors={"routing_direction": routing_directions,
+                   "dispatching_rule": dispatching_rule},
+          order_release=False,
+          pp_02=False,
+          alpha=0),
+    # PP_02
+    Block(name="ThesisProject",
+          factors={"alpha": alpha,
+                   "routing_direction": routing_directions},
+          order_release=False,
+          pp_02=True,
+          dispatching_rule="FCFS"),
+])
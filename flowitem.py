@@ -3,8 +3,63 @@ Project: ProcessSim
 Made By: Arno Kasper
 Version: 1.0.0
 """
+from array import array
+from collections.abc import MutableMapping
+import numpy as np
+
+
+class StationView(MutableMapping):
+    __slots__ = ("order", "values", "decode", "encode")
+
+    def __init__(self, order, values, decode=None, encode=None):
+        """
+        dictionary view with the names of the work centres of the routing as keys on a per-station array of an order
+        :param order: order object
+        :param values: array indexed by work centre id
+        :param decode: function from the stored value to the value of the view
+        :param encode: function from the value of the view to the stored value
+        """
+        self.order = order
+        self.values = values
+        self.decode = decode
+        self.encode = encode
+
+    def __getitem__(self, work_centre):
+        index = self.order.sim.model_panel.WORK_CENTRE_INDEX.get(work_centre)
+        if index not in self.order.routing:
+            raise KeyError(work_centre)
+        value = self.values[index]
+        if self.decode is not None:
+            return self.decode(value)
+        return value
+
+    def __setitem__(self, work_centre, value):
+        if self.encode is not None:
+            value = self.encode(value)
+        self.values[self.order.sim.model_panel.WORK_CENTRE_INDEX[work_centre]] = value
+
+    def __delitem__(self, work_centre):
+        raise TypeError("work centres can not be removed from the per-station fields of an order")
+
+    def __iter__(self):
+        return iter(self.order.routing_sequence_data)
+
+    def __len__(self):
+        return len(self.order.routing)
+
+    def __repr__(self):
+        return repr(dict(self))
+
 
 class Order(object):
+    # the attributes are fixed, an order has no __dict__
+    __slots__ = ("sim", "customized_control", "identifier", "entry_time", "release", "Release", "first_entry",
+                 "release_time", "pool_time", "routing", "routing_step",
+                 "station_process_time", "process_time_cumulative", "station_dispatching_priority",
+                 "station_queue_entry_time", "station_proc_finished_time", "station_queue_time",
+                 "station_order_start_time", "station_passed", "station_ODD", "corrected_load", "routing_mask",
+                 "due_date", "PRD", "finishing_time", "continuous_trigger", "process", "work_center_RQ")
+
     # __ Set all params related to an instance of an process (order)
     def __init__(self, simulation):
         """
@@ -17,73 +72,106 @@ class Order(object):
         self.customized_control = self.sim.model_panel.CUSTOM_CONTROL
 
         # CEM params
+        self.identifier = 0
         self.entry_time = 0
 
         # pool params
         self.release = False
+        self.Release = False
         self.first_entry = True
         self.release_time = 0
         self.pool_time = 0
 
-        # rotting sequence params
+        # rotting sequence params, the routing is a tuple of work centre ids and the step points to the current one
         if self.sim.model_panel.WC_AND_FLOW_CONFIGURATION == "GFS" or \
                 self.sim.model_panel.WC_AND_FLOW_CONFIGURATION == "RJS":
-            self.routing_sequence = self.sim.random_generator.sample(
-                self.sim.model_panel.MANUFACTURING_FLOOR_LAYOUT,
-                self.sim.random_generator.randint(1, len(self.sim.model_panel.MANUFACTURING_FLOOR_LAYOUT)))
+            if self.sim.variate_streams is not None:
+                routing = self.sim.variate_streams.routing()
+            else:
+                maximum_length = len(self.sim.model_panel.WORK_CENTRES)
+                if self.sim.model_panel.MAX_ROUTING_LENGTH is not None:
+                    maximum_length = min(self.sim.model_panel.MAX_ROUTING_LENGTH, maximum_length)
+                routing = self.sim.random_generator.sample(
+                    self.sim.model_panel.WORK_CENTRES,
+                    self.sim.random_generator.randint(1, maximum_length))
             # Sort the routing if necessary
             if self.sim.model_panel.WC_AND_FLOW_CONFIGURATION == "GFS":
-                self.routing_sequence.sort()  # GFS or PFS require sorted list of stations
+                routing.sort()  # GFS or PFS require sorted list of stations
 
         elif self.sim.model_panel.WC_AND_FLOW_CONFIGURATION == "PFS":
-            self.routing_sequence = self.sim.model_panel.MANUFACTURING_FLOOR_LAYOUT.copy()
+            routing = self.sim.model_panel.WORK_CENTRES
 
         elif self.sim.model_panel.WC_AND_FLOW_CONFIGURATION == "PJS":
-            self.routing_sequence = \
-                self.sim.random_generator.shuffle(self.sim.model_panel.MANUFACTURING_FLOOR_LAYOUT)
+            routing = self.sim.model_panel.WORK_CENTRES.copy()
+            self.sim.random_generator.shuffle(routing)
         else:
             raise Exception("Please indicate an allowed the work centre and flow configuration")
 
-        # Make a variable independent from routing sequence to allow for queue switching
-        self.routing_sequence_data = self.routing_sequence[:]
+        self.routing = tuple(routing)
+        self.routing_step = 0
 
-        # Make libary variables according to routing_sequence ----------------------------------------------------------
-        # process time
-        self.process_time = {}
-        self.process_time_cumulative = 0
+        # Make per-station arrays indexed by work centre id ------------------------------------------------------------
+        # in a large shop the per-station fields are dictionaries with the work centres of the routing only
+        number_of_work_centres = self.sim.model_panel.NUMBER_OF_WORKCENTRES
+        large_shop = self.sim.model_panel.LARGE_SHOP
 
-        # priority
-        self.dispatching_priority = {}
+        if large_shop:
+            self.station_process_time = dict.fromkeys(self.routing, 0.0)
+            self.station_dispatching_priority = dict.fromkeys(self.routing, 0)
+            self.station_queue_entry_time = dict.fromkeys(self.routing, 0.0)
+            self.station_proc_finished_time = dict.fromkeys(self.routing, 0.0)
+            self.station_queue_time = dict.fromkeys(self.routing, 0.0)
+            self.station_order_start_time = dict.fromkeys(self.routing, 0.0)
+            self.station_passed = dict.fromkeys(self.routing, False)
+        else:
+            # process time
+            self.station_process_time = array("d", bytes(8 * number_of_work_centres))
+
+            # priority
+            self.station_dispatching_priority = [0] * number_of_work_centres
+
+            # data collection variables
+            self.station_queue_entry_time = array("d", bytes(8 * number_of_work_centres))
+            self.station_proc_finished_time = array("d", bytes(8 * number_of_work_centres))
+            self.station_queue_time = array("d", bytes(8 * number_of_work_centres))
+            self.station_order_start_time = array("d", bytes(8 * number_of_work_centres))
+            self.station_passed = bytearray(number_of_work_centres)  # tracks which machine was used
+        self.process_time_cumulative = 0
 
-        # data collection variables
-        self.queue_entry_time = {}
-        self.proc_finished_time = {}
-        self.queue_time = {}
-        self.order_start_time = {}
-        self.machine_route = {}  # tracks which machine was used
+        process_time_stream = None
+        if self.sim.variate_streams is not None:
+            process_time_stream = self.sim.variate_streams.process_time
 
-        for WC in self.routing_sequence:
+        for WC in self.routing:
             # Type of process time distribution
-            if self.sim.model_panel.PROCESS_TIME_DISTRIBUTION == "2_erlang":
-                self.process_time[WC] = self.sim.general_functions.two_erlang_truncated()
+            if process_time_stream is not None:
+                process_time = process_time_stream()
+            elif self.sim.model_panel.PROCESS_TIME_DISTRIBUTION == "2_erlang":
+                process_time = self.sim.general_functions.two_erlang_truncated()
             elif self.sim.model_panel.PROCESS_TIME_DISTRIBUTION == "lognormal":
-                self.process_time[WC] = self.sim.general_functions.log_normal_truncated()
+                process_time = self.sim.general_functions.log_normal_truncated()
             elif self.sim.model_panel.PROCESS_TIME_DISTRIBUTION == "constant":
-                self.process_time[WC] = self.sim.model_panel.MEAN_PROCESS_TIME
+                process_time = self.sim.model_panel.MEAN_PROCESS_TIME
             else:
                 raise Exception("Please indicate a allowed process time distribution")
+            self.station_process_time[WC] = process_time
 
             # calculate cum
-            self.process_time_cumulative += self.process_time[WC]
-
-            self.dispatching_priority[WC] = 0
+            self.process_time_cumulative += process_time
 
-            # data collection variables
-            self.queue_entry_time[WC] = 0
-            self.proc_finished_time[WC] = 0
-            self.queue_time[WC] = 0
-            self.order_start_time[WC] = 0
-            self.machine_route[WC] = "NOT_PASSED"
+        # corrected load contribution to each work centre, see Land (2004)
+        self.corrected_load = None
+        self.routing_mask = None
+        if self.sim.policy_panel.release_control and large_shop:
+            self.corrected_load = dict()
+            for i, WC in enumerate(self.routing):
+                self.corrected_load[WC] = self.station_process_time[WC] / (i + 1)
+        elif self.sim.policy_panel.release_control:
+            self.corrected_load = np.zeros(self.sim.model_panel.NUMBER_OF_WORKCENTRES)
+            self.routing_mask = np.zeros(self.sim.model_panel.NUMBER_OF_WORKCENTRES, dtype=bool)
+            for i, WC in enumerate(self.routing):
+                self.corrected_load[WC] = self.station_process_time[WC] / (i + 1)
+                self.routing_mask[WC] = True
 
         # Due Date -----------------------------------------------------------------------------------------------------
         self.due_date = None
@@ -102,12 +190,14 @@ class Order(object):
             else:
                 raise Exception("Please indicate a allowed due date procedure")
 
-        self.PRD = self.due_date - (len(self.routing_sequence) * self.sim.policy_panel.PRD_k)
-        self.ODDs = {}
+        self.PRD = self.due_date - (len(self.routing) * self.sim.policy_panel.PRD_k)
+        if large_shop:
+            self.station_ODD = dict.fromkeys(self.routing, np.nan)
+        else:
+            self.station_ODD = array("d", [np.nan]) * number_of_work_centres  # NaN until the ODD is set
         if self.sim.policy_panel.dispatching_rule == "ODD_k":
-            for WC in self.routing_sequence:
-                self.ODDs[WC] = self.due_date - (
-                        (len(self.routing_sequence) - (self.routing_sequence.index(WC) + 1)) * self.sim.policy_panel.ODD_k)
+            for i, WC in enumerate(self.routing):
+                self.station_ODD[WC] = self.due_date - ((len(self.routing) - (i + 1)) * self.sim.policy_panel.ODD_k)
 
         # Other order parameters ---------------------------------------------------------------------------------------
         # data collection
@@ -115,4 +205,60 @@ class Order(object):
 
         # Other
         self.continuous_trigger = False
-        return
\ No newline at end of file
+        self.process = None
+        self.work_center_RQ = None
+        return
+
+    @property
+    def name(self):
+        return 'Order%07d' % self.identifier
+
+    # names of the work centres of the routing, for reporting and the customized settings ---------------------------
+    @property
+    def routing_sequence(self):
+        """
+        :return: list with the names of the work centres that are not yet passed
+        """
+        return [self.sim.model_panel.MANUFACTURING_FLOOR_LAYOUT[WC] for WC in self.routing[self.routing_step:]]
+
+    @property
+    def routing_sequence_data(self):
+        """
+        :return: list with the names of the work centres of the complete routing
+        """
+        return [self.sim.model_panel.MANUFACTURING_FLOOR_LAYOUT[WC] for WC in self.routing]
+
+    # dictionary views on the per-station arrays, e.g. for the customized settings ------------------------------------
+    @property
+    def process_time(self):
+        return StationView(order=self, values=self.station_process_time)
+
+    @property
+    def dispatching_priority(self):
+        return StationView(order=self, values=self.station_dispatching_priority)
+
+    @property
+    def queue_entry_time(self):
+        return StationView(order=self, values=self.station_queue_entry_time)
+
+    @property
+    def proc_finished_time(self):
+        return StationView(order=self, values=self.station_proc_finished_time)
+
+    @property
+    def queue_time(self):
+        return StationView(order=self, values=self.station_queue_time)
+
+    @property
+    def order_start_time(self):
+        return StationView(order=self, values=self.station_order_start_time)
+
+    @property
+    def machine_route(self):
+        return StationView(order=self, values=self.station_passed,
+                           decode=lambda passed: "PASSED" if passed else "NOT_PASSED",
+                           encode=lambda route: route == "PASSED")
+
+    @property
+    def ODDs(self):
+        return StationView(order=self, values=self.station_ODD)
\ No newline at end of file
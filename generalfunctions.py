@@ -10,7 +10,7 @@ class GeneralFunctions(object):
     def __init__(self, simulation):
         self.sim = simulation
         self.random_generator = random.Random()
-        self.random_generator.seed(999999)
+        self.random_generator.seed(self.sim.seed)
 
         self.stddev_dictonary_inf = {1.5: 1.0708,
                                      1.0: 0.8325,
@@ -24,7 +24,13 @@ class GeneralFunctions(object):
                                    0.25: -0.0302,
                                    0.10: -0.005}
 
-    def arrival_time_calculator(self, wc_and_flow_config, manufacturing_floor_layout, aimed_utilization, mean_process_time, number_of_machines, cv=1):
+        self.truncation_dictionary_8 = {0.5: 24.66,
+                                        1: 33.83,
+                                        1.5: 44.25,
+                                        2: 51.58,
+                                        2.5: 80}
+
+    def arrival_time_calculator(self, wc_and_flow_config, manufacturing_floor_layout, aimed_utilization, mean_process_time, number_of_machines, maximum_routing_length=None, cv=1):
         """
         compute the inter arrival time
         :param wc_and_flow_config: the configuration
@@ -32,12 +38,16 @@ class GeneralFunctions(object):
         :param aimed_utilization: the average utilization
         :param mean_process_time: the average process time
         :param number_of_machines: number of machines for each station
+        :param maximum_routing_length: maximum number of work centres of a GFS or RJS routing, None for all
         :param cv: coefficient of variation
         :return: inter arrival time
         """
         mean_amount_work_centres = 0
         if wc_and_flow_config == "GFS" or wc_and_flow_config == "RJS":
-            mean_amount_work_centres = (len(manufacturing_floor_layout) + 1) / 2
+            maximum_amount_work_centres = len(manufacturing_floor_layout)
+            if maximum_routing_length is not None:
+                maximum_amount_work_centres = min(maximum_routing_length, maximum_amount_work_centres)
+            mean_amount_work_centres = (maximum_amount_work_centres + 1) / 2
 
         elif wc_and_flow_config == "PFS" or wc_and_flow_config == "PJS":
             mean_amount_work_centres = len(manufacturing_floor_layout)
@@ -66,12 +76,7 @@ class GeneralFunctions(object):
         else:
             # ensure the accurate distribution due to truncation cut-off
             if self.sim.model_panel.TRUNCATION_POINT_PROCESS_TIME == 8:
-                truncation_dictionary = {0.5: 24.66,
-                                        1: 33.83,
-                                        1.5: 44.25,
-                                        2: 51.58,
-                                        2.5: 80}
-                truncation_point = truncation_dictionary[self.sim.model_panel.STD_DEV_PROCESS_TIME]
+                truncation_point = self.truncation_dictionary_8[self.sim.model_panel.STD_DEV_PROCESS_TIME]
 
             else:
                 raise Exception('No truncation dictionary available for this truncation point')
@@ -119,7 +124,7 @@ class GeneralFunctions(object):
         :param order: Due Date value
         """
         Returnvalue = self.sim.env.now + (order.process_time_cumulative +
-                                          (self.sim.policy_panel.DD_factor_K_value * len(order.routing_sequence)))
+                                          (self.sim.policy_panel.DD_factor_K_value * len(order.routing)))
         return Returnvalue
 
     def add_contant_DD(self, order):
@@ -146,28 +151,11 @@ class GeneralFunctions(object):
         :param order:
         """
         slack = order.due_date - self.sim.env.now
+        remaining_steps = len(order.routing) - order.routing_step
         if slack >= 0:
-            for WC in order.routing_sequence:
-                order.ODDs[WC] = self.sim.env.now + (order.routing_sequence.index(WC) + 1) *\
-                                 (slack / len(order.routing_sequence))
+            for i, WC in enumerate(order.routing[order.routing_step:]):
+                order.station_ODD[WC] = self.sim.env.now + (i + 1) * (slack / remaining_steps)
         else:
-            for WC in order.routing_sequence:
-                order.ODDs[WC] = self.sim.env.now
+            for WC in order.routing[order.routing_step:]:
+                order.station_ODD[WC] = self.sim.env.now
         return
-
-    def MODD_load_control(self, queue_list, work_center):
-        """
-        Update following MODD by Baker & Kenet (1988)
-        :param order:
-        :param work_center:
-        """
-        # get the orders from the queue
-        for i, order_queue in enumerate(queue_list):
-            result_MODD = max(
-                (self.sim.env.now + order_queue[0].process_time[work_center]),
-                order_queue[0].ODDs[work_center]
-            )
-            order_queue[0].dispatching_priority[work_center] = result_MODD
-            order_queue[1] = result_MODD
-        return queue_list
-
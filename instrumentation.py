@@ -0,0 +1,184 @@
+"""
+Project: ProcessSim
+Made By: Arno Kasper
+Version: 1.0.0
+"""
+from functools import wraps
+import json
+import time
+from data_collection_and_storage import RunningStatistics
+
+# entry points of the model with their subsystem, the time of nested entry points is not counted twice
+ENTRY_POINTS = {"source": ["new_order", "inter_arrival_time"],
+                "release_control": ["order_pool", "evaluate_release", "aggregate_load_release", "continuous_trigger",
+                                    "finished_load", "periodic_release_check"],
+                "process": ["put_in_queue", "release_orders", "dispatch_order", "request_capacity",
+                            "start_processing", "operation_finished"],
+                "dispatching": ["get_most_urgent_order"],
+                "data_collection": ["data_collection_intermediate", "data_collection_final", "run_update"]}
+
+
+class Instrumentation(object):
+    def __init__(self, simulation):
+        """
+        wall-time counters of the subsystems and event counters of a simulation. The entry points are wrapped on the
+        objects of the simulation, the model code is not changed when the instrumentation is off. Time outside the
+        entry points is counted as engine time, the event handling of SimPy or the calendar queue
+        :param simulation: simulation object
+        """
+        self.sim = simulation
+        self.seconds = {"engine": 0.0}
+        self.calls = {"engine": 0}
+        self.counters = {"arrivals": 0, "released_orders": 0, "dispatches": 0, "finished_orders": 0}
+        self.queue_length_at_dispatch = RunningStatistics()
+        self.maximum_queue_length = 0
+        self.events = 0
+        self.active = "engine"
+        self.stack = list()
+        self.mark = 0.0
+        self.start_time = 0.0
+        self.wall_time = 0.0
+
+        for subsystem in ENTRY_POINTS:
+            self.seconds[subsystem] = 0.0
+            self.calls[subsystem] = 0
+
+        # wrap the entry points
+        subsystem_objects = {"source": [self.sim.source],
+                             "release_control": [self.sim.release_control],
+                             "process": [self.sim.process],
+                             "dispatching": [self.sim.process],
+                             "data_collection": [self.sim.process, self.sim.data_collection]}
+        for subsystem, names in ENTRY_POINTS.items():
+            for obj in subsystem_objects[subsystem]:
+                for name in names:
+                    if hasattr(type(obj), name):
+                        setattr(obj, name, self.timed(subsystem=subsystem, method=getattr(obj, name)))
+
+        # event counters
+        self.count(obj=self.sim.source, name="new_order", counter=self.count_arrival)
+        self.count(obj=self.sim.process, name="release_orders", counter=self.count_release)
+        self.count(obj=self.sim.process, name="get_most_urgent_order", counter=self.count_dispatch)
+        self.count(obj=self.sim.process, name="data_collection_final", counter=self.count_finished_order)
+        if hasattr(self.sim.env, "step"):
+            self.count(obj=self.sim.env, name="step", counter=self.count_event)
+
+    def timed(self, subsystem, method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            self.enter(subsystem=subsystem)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.leave()
+        return wrapper
+
+    def count(self, obj, name, counter):
+        method = getattr(obj, name)
+
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            result = method(*args, **kwargs)
+            counter(result, *args, **kwargs)
+            return result
+        setattr(obj, name, wrapper)
+        return
+
+    def enter(self, subsystem):
+        now = time.perf_counter()
+        self.seconds[self.active] += now - self.mark
+        self.stack.append(self.active)
+        self.active = subsystem
+        self.calls[subsystem] += 1
+        self.mark = now
+        return
+
+    def leave(self):
+        now = time.perf_counter()
+        self.seconds[self.active] += now - self.mark
+        self.active = self.stack.pop()
+        self.mark = now
+        return
+
+    # counters ---------------------------------------------------------------------------------------------------------
+    def count_arrival(self, result, identifier):
+        self.counters["arrivals"] += 1
+
+    def count_release(self, result, orders):
+        self.counters["released_orders"] += len(orders)
+
+    def count_dispatch(self, result, work_centre):
+        if result[0] is not None:
+            self.counters["dispatches"] += 1
+            # the queue length before the order was taken out
+            queue_length = len(self.sim.model_panel.ORDER_QUEUES[work_centre]) + 1
+            self.queue_length_at_dispatch.update(queue_length)
+            self.maximum_queue_length = max(self.maximum_queue_length, queue_length)
+
+    def count_finished_order(self, result, order):
+        self.counters["finished_orders"] += 1
+
+    def count_event(self, result):
+        self.events += 1
+
+    # measurement ------------------------------------------------------------------------------------------------------
+    def start(self):
+        """
+        start the wall-time counters, at the start of the simulation
+        :return: void
+        """
+        self.start_time = time.perf_counter()
+        self.mark = self.start_time
+        self.active = "engine"
+        return
+
+    def stop(self):
+        """
+        stop the wall-time counters, at the end of the simulation
+        :return: void
+        """
+        now = time.perf_counter()
+        self.seconds[self.active] += now - self.mark
+        self.mark = now
+        self.wall_time = now - self.start_time
+        return
+
+    def report(self):
+        """
+        :return: dictionary with the measurements
+        """
+        # the calendar engine counts the scheduled events, the events left in the queue are not served
+        events = self.events
+        if not hasattr(self.sim.env, "step"):
+            events = self.sim.env.counter - len(self.sim.env.queue)
+
+        wall_time = max(self.wall_time, 1e-9)
+        return {"experiment_number": self.sim.exp_number,
+                "replication": self.sim.replication,
+                "warm_up_pilot": self.sim.warm_up_pilot,
+                "simulation_engine": self.sim.model_panel.SIMULATION_ENGINE,
+                "wall_time": self.wall_time,
+                "simulated_time": float(self.sim.env.now),
+                "simulated_time_per_second": float(self.sim.env.now) / wall_time,
+                "events": events,
+                "events_per_second": events / wall_time,
+                "subsystems": {subsystem: {"calls": self.calls[subsystem],
+                                           "seconds": self.seconds[subsystem],
+                                           "share": self.seconds[subsystem] / wall_time}
+                               for subsystem in self.seconds},
+                "counters": dict(self.counters),
+                "queue_length_at_dispatch": {"mean": self.queue_length_at_dispatch.mean,
+                                             "maximum": self.maximum_queue_length}}
+
+    def emit(self):
+        """
+        write the report as a JSON line to the instrumentation file, or print it if there is no file
+        :return: void
+        """
+        line = json.dumps(self.report())
+        if self.sim.model_panel.INSTRUMENTATION_FILE is None:
+            print(line)
+            return
+        with open(self.sim.model_panel.INSTRUMENTATION_FILE, "a") as file:
+            file.write(line + "\n")
+        return
@@ -0,0 +1,303 @@
+"""
+Project: ProcessSim
+Made By: Arno Kasper
+Version: 1.0.0
+"""
+from bisect import bisect_left, insort
+from collections.abc import MutableSequence
+from heapq import heappush, heappop, heapify
+from operator import itemgetter
+
+
+class OrderQueue(object):
+    def __init__(self):
+        """
+        priority queue in front of a work centre. Replaces the FilterStore queue, the queue item with the lowest
+        dispatching priority is served first and ties are broken by the moment of entering the queue (FCFS)
+
+        Key for the heap entries
+            0: dispatching priority
+            1: entry counter
+            2: queue item
+        """
+        self.heap = list()
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __iter__(self):
+        """
+        iterate over the queue items without any specific order
+        :return: queue items
+        """
+        for entry in self.heap:
+            yield entry[2]
+
+    @property
+    def items(self):
+        """
+        snapshot of the queue items in order of entering the queue
+        :return: list with queue items
+        """
+        return [entry[2] for entry in sorted(self.heap, key=itemgetter(1))]
+
+    def put(self, queue_item):
+        """
+        add a queue item to the queue
+        :param queue_item: list with the queue attributes, see Process.queue_item
+        :return: void
+        """
+        heappush(self.heap, (queue_item[1], self.counter, queue_item))
+        self.counter += 1
+        return
+
+    def get(self):
+        """
+        remove the queue item with the highest priority from the queue
+        :return: queue item
+        """
+        return heappop(self.heap)[2]
+
+    def remove(self, queue_item):
+        """
+        remove a specific queue item from the queue
+        :param queue_item: list with the queue attributes
+        :return: void
+        """
+        for i, entry in enumerate(self.heap):
+            if entry[2] is queue_item:
+                self.heap[i] = self.heap[-1]
+                self.heap.pop()
+                heapify(self.heap)
+                return
+        raise ValueError("queue item not in the queue")
+
+    def reprioritise(self):
+        """
+        rebuild the heap after the priorities of the queue items are changed
+        :return: void
+        """
+        self.heap = [(entry[2][1], entry[1], entry[2]) for entry in self.heap]
+        heapify(self.heap)
+        return
+
+
+class MODDQueue(object):
+    def __init__(self, work_centre):
+        """
+        queue in front of a work centre for MODD dispatching, Baker & Kanet (1988). The MODD priority of an order is
+        max(now + p, ODD) with p the process time at the work centre. An order is late once now + p passes its ODD and
+        stays late, so the queue is split in two heaps instead of updating all priorities at each dispatch. The orders
+        that are not late are ordered by ODD, the late orders by p. Ties are broken by the moment of entering the
+        queue (FCFS), as by the OrderQueue
+        :param work_centre: work centre id of the queue
+
+        Key for the heap entries
+            0: ODD (early), moment of becoming late ODD - p (becoming_late) or p (late)
+            1: entry counter
+            2: queue item
+        """
+        self.work_centre = work_centre
+        self.early = list()
+        self.becoming_late = list()
+        self.late = list()
+        self.queued = dict()  # queue items by entry counter, in order of entering the queue
+        self.late_counters = set()
+        self.counters = dict()
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.queued)
+
+    def __iter__(self):
+        return iter(list(self.queued.values()))
+
+    @property
+    def items(self):
+        """
+        snapshot of the queue items in order of entering the queue
+        :return: list with queue items
+        """
+        return list(self.queued.values())
+
+    def put(self, queue_item):
+        """
+        add a queue item to the queue, the order is early until the next dispatch
+        :param queue_item: list with the queue attributes, see Process.queue_item
+        :return: void
+        """
+        order = queue_item[0]
+        process_time = order.station_process_time[self.work_centre]
+        ODD = order.station_ODD[self.work_centre]
+        heappush(self.early, (ODD, self.counter, queue_item))
+        heappush(self.becoming_late, (ODD - process_time, self.counter, queue_item))
+        self.queued[self.counter] = queue_item
+        self.counters[id(queue_item)] = self.counter
+        self.counter += 1
+        return
+
+    def first(self, heap):
+        # skip the entries of removed queue items and of the early orders that became late
+        while heap and (heap[0][1] not in self.queued or (heap is self.early and heap[0][1] in self.late_counters)):
+            heappop(heap)
+        if heap:
+            return heap[0]
+        return None
+
+    def get(self, now):
+        """
+        remove the queue item with the lowest MODD priority from the queue, the priority is put in the queue item
+        :param now: the current time
+        :return: queue item
+        """
+        # move the orders that became late
+        while self.becoming_late and self.becoming_late[0][0] <= now:
+            _, counter, queue_item = heappop(self.becoming_late)
+            if counter in self.queued:
+                self.late_counters.add(counter)
+                heappush(self.late, (queue_item[0].station_process_time[self.work_centre], counter, queue_item))
+
+        # compare the first early and the first late order
+        selected = None
+        for entry in (self.first(self.early), self.first(self.late)):
+            if entry is not None:
+                order = entry[2][0]
+                priority = max(now + order.station_process_time[self.work_centre], order.station_ODD[self.work_centre])
+                if selected is None or (priority, entry[1]) < selected[:2]:
+                    selected = (priority, entry[1], entry[2])
+        priority, counter, queue_item = selected
+
+        queue_item[1] = priority
+        self.discard(counter=counter)
+        return queue_item
+
+    def remove(self, queue_item):
+        """
+        remove a specific queue item from the queue
+        :param queue_item: list with the queue attributes
+        :return: void
+        """
+        if id(queue_item) not in self.counters:
+            raise ValueError("queue item not in the queue")
+        self.discard(counter=self.counters[id(queue_item)])
+        return
+
+    def discard(self, counter):
+        # the heap entries are skipped once they come first
+        queue_item = self.queued.pop(counter)
+        del self.counters[id(queue_item)]
+        self.late_counters.discard(counter)
+        return
+
+
+class QueueItems(MutableSequence):
+    def __init__(self, queue):
+        """
+        the queue items in order of entering the queue, for the customized dispatching. The snapshot of the queue is
+        only made when the items are used, a dispatching mode that does not look at the queue costs nothing. The
+        items can be changed and sorted like a list, the changes are made to the snapshot and not to the queue
+        :param queue: OrderQueue or MODDQueue object
+        """
+        self.queue = queue
+        self.snapshot = None
+
+    def items(self):
+        if self.snapshot is None:
+            self.snapshot = self.queue.items
+        return self.snapshot
+
+    def __getitem__(self, index):
+        return self.items()[index]
+
+    def __setitem__(self, index, value):
+        self.items()[index] = value
+
+    def __delitem__(self, index):
+        del self.items()[index]
+
+    def __len__(self):
+        return len(self.items())
+
+    def __iter__(self):
+        return iter(self.items())
+
+    def insert(self, index, value):
+        self.items().insert(index, value)
+
+    def sort(self, key=None, reverse=False):
+        self.items().sort(key=key, reverse=reverse)
+
+
+class OrderPool(object):
+    def __init__(self):
+        """
+        pool with flow items before the process. Replaces the FilterStore pool, the pool items are kept in sequence
+        and indexed by the first work centre of the routing
+
+        Key for the entries
+            0: sequencing priority
+            1: entry counter
+            2: pool item
+        """
+        self.entries = list()
+        self.first_step = dict()
+        self.keys = dict()
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def items(self):
+        """
+        snapshot of the pool items in sequence
+        :return: list with pool items
+        """
+        return [entry[2] for entry in self.entries]
+
+    def put(self, pool_item, sequence=True):
+        """
+        add a pool item to the pool
+        :param pool_item: list with the pool attributes, see ReleaseControl.order_pool
+        :param sequence: if False, the pool item is sequenced on entering the pool (FCFS)
+        :return: void
+        """
+        if sequence:
+            key = (pool_item[1], self.counter)
+        else:
+            key = (self.counter, self.counter)
+        self.counter += 1
+        self.keys[id(pool_item)] = key
+
+        entry = (*key, pool_item)
+        insort(self.entries, entry)
+        work_centre = pool_item[0].routing[0]
+        if work_centre not in self.first_step:
+            self.first_step[work_centre] = list()
+        insort(self.first_step[work_centre], entry)
+        return
+
+    def remove(self, pool_item):
+        """
+        remove a pool item from the pool
+        :param pool_item: list with the pool attributes
+        :return: void
+        """
+        key = self.keys.pop(id(pool_item))
+        pool_item[2] = 0
+        del self.entries[bisect_left(self.entries, key)]
+        work_centre_entries = self.first_step[pool_item[0].routing[0]]
+        del work_centre_entries[bisect_left(work_centre_entries, key)]
+        return
+
+    def first(self, work_centre):
+        """
+        the pool item with the highest priority that starts its routing at the work centre
+        :param work_centre: first work centre of the routing
+        :return: pool item or None
+        """
+        work_centre_entries = self.first_step.get(work_centre)
+        if not work_centre_entries:
+            return None
+        return work_centre_entries[0][2]
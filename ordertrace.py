@@ -0,0 +1,133 @@
+"""
+Project: ProcessSim
+Made By: Arno Kasper
+Version: 1.0.0
+"""
+import json
+import os
+import numpy as np
+
+# a record for each operation of an order, the order attributes are repeated for each operation
+TRACE_DTYPE = np.dtype([("identifier", np.int64),
+                        ("work_centre", np.int32),
+                        ("routing_step", np.int32),
+                        ("entry_time", np.float64),
+                        ("release_time", np.float64),
+                        ("due_date", np.float64),
+                        ("queue_entry_time", np.float64),
+                        ("start_time", np.float64),
+                        ("process_time", np.float64),
+                        ("finish_time", np.float64)])
+
+# the header is a JSON text with the record type and the number of records, padded to a fixed size
+HEADER_SIZE = 4096
+TRACE_FORMAT = "ProcessSim order trace"
+
+
+def write_header(file, number_of_records):
+    header = json.dumps({"format": TRACE_FORMAT,
+                         "version": 1,
+                         "dtype": TRACE_DTYPE.descr,
+                         "records": number_of_records}).encode()
+    file.seek(0)
+    file.write(header.ljust(HEADER_SIZE, b" "))
+    return
+
+
+def read_header(path):
+    with open(path, "rb") as file:
+        header = json.loads(file.read(HEADER_SIZE).decode())
+    if header.get("format") != TRACE_FORMAT:
+        raise Exception(f"Please indicate an order trace file, {path} is not an order trace")
+    return header
+
+
+class OrderTrace(object):
+    def __init__(self, path, chunk_size=65536):
+        """
+        writer of the order trace, a binary file with a fixed-size record for each operation of the finished orders.
+        The records are written into a memory-mapped window of the file. Only the window is held in memory, when it
+        is full it is flushed and the file is extended with the next window
+        :param path: path of the trace file, an existing file is replaced
+        :param chunk_size: number of records of the window
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.size = 0  # number of written records
+        self.chunk_start = 0  # record number of the first record of the window
+        self.window = None
+
+        with open(self.path, "wb") as file:
+            write_header(file=file, number_of_records=0)
+        self.map_window()
+
+    def map_window(self):
+        """
+        extend the file and map the window from the current record onwards
+        :return: void
+        """
+        self.chunk_start = self.size
+        os.truncate(self.path, HEADER_SIZE + (self.chunk_start + self.chunk_size) * TRACE_DTYPE.itemsize)
+        self.window = np.memmap(self.path, dtype=TRACE_DTYPE, mode="r+",
+                                offset=HEADER_SIZE + self.chunk_start * TRACE_DTYPE.itemsize,
+                                shape=(self.chunk_size,))
+        return
+
+    def flush(self):
+        """
+        write the window to the file and update the number of records in the header
+        :return: void
+        """
+        self.window.flush()
+        with open(self.path, "r+b") as file:
+            write_header(file=file, number_of_records=self.size)
+        return
+
+    def write_order(self, order):
+        """
+        add the records of the operations of a finished order
+        :param order: order object
+        :return: void
+        """
+        for step, work_centre in enumerate(order.routing):
+            if self.size - self.chunk_start == self.chunk_size:
+                self.flush()
+                self.map_window()
+            self.window[self.size - self.chunk_start] = (order.identifier,
+                                                         work_centre,
+                                                         step,
+                                                         order.entry_time,
+                                                         order.release_time,
+                                                         order.due_date,
+                                                         order.station_queue_entry_time[work_centre],
+                                                         order.station_order_start_time[work_centre],
+                                                         order.station_process_time[work_centre],
+                                                         order.station_proc_finished_time[work_centre])
+            self.size += 1
+        return
+
+    def close(self):
+        """
+        flush the last window and cut the unused part of the file
+        :return: void
+        """
+        if self.window is None:
+            return
+        self.flush()
+        self.window = None
+        os.truncate(self.path, HEADER_SIZE + self.size * TRACE_DTYPE.itemsize)
+        return
+
+
+def read_trace(path):
+    """
+    open an order trace as a structured array. The array is a read-only memory map of the file, the records are not
+    copied into memory
+    :param path: path of the trace file
+    :return: structured array with a record for each operation, see TRACE_DTYPE for the fields
+    """
+    header = read_header(path=path)
+    dtype = np.dtype([tuple(field) for field in header["dtype"]])
+    if header["records"] == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(header["records"],))
@@ -4,8 +4,8 @@ Made By: Arno Kasper
 Version: 1.0.0
 """
 from operator import itemgetter
-import numpy as np
 import random
+from orderqueue import MODDQueue, QueueItems
 
 class Process(object):
     def __init__(self, simulation):
@@ -17,7 +17,11 @@ class Process(object):
         self.dispatching_rule = self.sim.policy_panel.dispatching_rule
         self.customized_control = self.sim.model_panel.CUSTOM_CONTROL
         self.random_generator = random.Random()
-        self.random_generator.seed(999999)
+        self.random_generator.seed(self.sim.seed)
+
+        # MODD queues find the most urgent order without updating the priorities of the whole queue
+        if self.dispatching_rule == "MODD":
+            self.sim.model_panel.ORDER_QUEUES = [MODDQueue(work_centre=WC) for WC in self.sim.model_panel.WORK_CENTRES]
 
     def put_in_queue(self, order):
 
@@ -26,48 +30,64 @@ class Process(object):
         :param order: order object
         :return:
         """
-        if order.first_entry:
-            # first time entering the floor
-            order.release_time = self.sim.env.now
-            order.pool_time = order.release_time - order.entry_time
-            order.first_entry = False
-            # update ODDs
-            if self.sim.policy_panel.dispatching_rule == "ODD_land" or "MODD":
-                self.sim.general_functions.ODD_land_adaption(order=order)
-
-        # get work centre
-        work_centre = order.routing_sequence[0]
-        order.queue_entry_time[work_centre] = self.sim.env.now
+        work_centre = self.enter_work_centre(order=order)
 
         # control if the order can be released
+        queue = self.sim.model_panel.ORDER_QUEUES[work_centre]
         if len(self.sim.model_panel.MANUFACTURING_FLOOR[work_centre].users) == 0:
-            if len(self.sim.model_panel.ORDER_QUEUES[work_centre].items) == 0:
-                order.process = self.sim.env.process(
-                    self.sim.process.capacity_process(order=order, work_centre=work_centre))
+            if len(queue) == 0:
+                self.start_operation(order=order, work_centre=work_centre)
             else:
                 # put back into the queue
                 queue_item = self.queue_item(order=order, work_centre=work_centre)
-                self.sim.model_panel.ORDER_QUEUES[work_centre].put(queue_item)
+                queue.put(queue_item)
                 self.dispatch_order(work_center=work_centre)
                 return
         # put in the queue
         else:
             # put back into the queue
             queue_item = self.queue_item(order=order, work_centre=work_centre)
-            self.sim.model_panel.ORDER_QUEUES[work_centre].put(queue_item)
+            queue.put(queue_item)
             return
 
-    def release_from_queue(self, work_center):
+    def release_orders(self, orders):
         """
-        removes an order from the queue
-        :param work_center: work_center number indicating the number of the capacity source
+        hand the released orders to the shop floor as one batch. The orders join the queues first, then each idle
+        work centre that received orders dispatches once
+        :param orders: list with the released order objects
         :return: void
         """
-        # sort the queue
-        self.sim.model_panel.ORDER_QUEUES[work_center].items.sort(key=itemgetter(3))
-        released_used = self.sim.model_panel.ORDER_QUEUES[work_center].get()
+        work_centres = dict()
+        for order in orders:
+            work_centre = self.enter_work_centre(order=order)
+            self.sim.model_panel.ORDER_QUEUES[work_centre].put(self.queue_item(order=order, work_centre=work_centre))
+            work_centres[work_centre] = None
+
+        for work_centre in work_centres:
+            if len(self.sim.model_panel.MANUFACTURING_FLOOR[work_centre].users) == 0:
+                self.dispatch_order(work_center=work_centre)
         return
 
+    def enter_work_centre(self, order):
+        """
+        register the arrival of an order at the work centre of its current routing step
+        :param order: order object
+        :return: work centre
+        """
+        if order.first_entry:
+            # first time entering the floor
+            order.release_time = self.sim.env.now
+            order.pool_time = order.release_time - order.entry_time
+            order.first_entry = False
+            # update ODDs
+            if self.sim.policy_panel.dispatching_rule == "ODD_land" or "MODD":
+                self.sim.general_functions.ODD_land_adaption(order=order)
+
+        # get work centre
+        work_centre = order.routing[order.routing_step]
+        order.station_queue_entry_time[work_centre] = self.sim.env.now
+        return work_centre
+
     def queue_item(self, order, work_centre):
         """
         make a list of attributes that needs ot be put into the queue
@@ -81,24 +101,24 @@ class Process(object):
         3: release index
         """
         # select dispatching rule
-        order.dispatching_priority[work_centre] = None
+        order.station_dispatching_priority[work_centre] = None
         if self.customized_control:
-            order.dispatching_priority[work_centre] = self.sim.customized_settings.queue_priority(order=order)
+            order.station_dispatching_priority[work_centre] = self.sim.customized_settings.queue_priority(order=order)
 
-        if order.dispatching_priority[work_centre] is None:
+        if order.station_dispatching_priority[work_centre] is None:
             if self.dispatching_rule == "FCFS":
-                order.dispatching_priority[work_centre] = order.identifier
+                order.station_dispatching_priority[work_centre] = order.identifier
             elif self.dispatching_rule == "SPT":
-                order.dispatching_priority[work_centre] = order.process_time[order.routing_sequence[0]]
+                order.station_dispatching_priority[work_centre] = order.station_process_time[work_centre]
             elif self.dispatching_rule == "ODD_land" or self.dispatching_rule == "ODD_k" or self.dispatching_rule == "MODD":
-                order.dispatching_priority[work_centre] = order.ODDs[work_centre]
+                order.station_dispatching_priority[work_centre] = order.station_ODD[work_centre]
             else:
                 raise Exception("no valid dispatching rule defined")
 
         # define queue object
         queue_item = [order,  # order object
-                      order.dispatching_priority[work_centre],  # order priority
-                      order.routing_sequence[0],  # next step
+                      order.station_dispatching_priority[work_centre],  # order priority
+                      work_centre,  # next step
                       1  # release from queue integer
                       ]
         return queue_item
@@ -119,53 +139,63 @@ class Process(object):
         # get the order object
         order = order_list[0]
 
-        self.release_from_queue(work_center=order.routing_sequence[0])
-        order.process = self.sim.env.process(
-            self.sim.process.capacity_process(order=order, work_centre=order.routing_sequence[0]))
+        self.start_operation(order=order, work_centre=order.routing[order.routing_step])
         return
 
     def get_most_urgent_order(self, work_centre):
         """
-        Update all priorities and routing steps in the queue
+        Remove the order with the highest priority from the queue and update its routing step
         :param work_centre: work_center number indicating the number of the capacity source
         :return: order, boolean: break_loop, boolean: free_load
         """
         # setup params
-        priority_list = list()
-        queue_list = None
+        queue = self.sim.model_panel.ORDER_QUEUES[work_centre]
         changed = False
 
         # if there are no items in the queue, return
-        if len(self.sim.model_panel.ORDER_QUEUES[work_centre].items) == 0:
+        if len(queue) == 0:
             return None, True, False
 
         # update priorities if required
         if self.customized_control:
-            queue_list = self.sim.model_panel.ORDER_QUEUES[work_centre].items
-            queue_list, changed = self.sim.customized_settings.dispatching_mode(queue_list=queue_list, work_centre=work_centre)
+            queue_list, changed = self.sim.customized_settings.dispatching_mode(queue_list=QueueItems(queue),
+                                                                                work_centre=work_centre)
+            if changed:
+                # select order with highest priority from the customized queue list
+                order = min(queue_list, key=itemgetter(1))
+                queue.remove(order)
 
         if not changed:
-            queue_list = self.sim.model_panel.ORDER_QUEUES[work_centre].items
-            # update queue list if required
+            # select order with highest priority, MODD finds the priority at the current time
             if self.dispatching_rule == "MODD":
-                queue_list = self.sim.general_functions.MODD_load_control(queue_list=queue_list, work_center=work_centre)
-
-        # find most urgent order in the queue
-        for i, order_list in enumerate(queue_list):
-            # update routing step
-            if len(order_list[0].routing_sequence) <= 1:
-                order_list[2] = "NA"
+                order = queue.get(now=self.sim.env.now)
+                order[0].station_dispatching_priority[work_centre] = order[1]
             else:
-                order_list[2] = order_list[0].routing_sequence[1]
-            priority_list.append(order_list)
+                order = queue.get()
 
-        # select order with highest priority
-        order = sorted(priority_list, key=itemgetter(1))[0]  # sort and pick with highest priority
+        # update routing step of the selected order
+        if order[0].routing_step + 1 >= len(order[0].routing):
+            order[2] = "NA"
+        else:
+            order[2] = order[0].routing[order[0].routing_step + 1]
 
         # set to zero to pull out of pull
         order[3] = 0
         return order, False, True
 
+    def start_operation(self, order, work_centre):
+        """
+        start the operation of an order at a work centre, as a SimPy process or as events of the calendar engine
+        :param order: order object
+        :param work_centre: work_center number indicating the number of the capacity source
+        :return: void
+        """
+        if self.sim.model_panel.SIMULATION_ENGINE == "calendar":
+            self.sim.env.start(self.request_capacity, args=(order, work_centre))
+        else:
+            order.process = self.sim.env.process(self.capacity_process(order=order, work_centre=work_centre))
+        return
+
     def capacity_process(self, order, work_centre):
         """
         The process with capacity sources
@@ -175,20 +205,53 @@ class Process(object):
         """
         # set params
         order.work_center_RQ = self.sim.model_panel.MANUFACTURING_FLOOR[work_centre]
-        req = order.work_center_RQ.request(priority=order.dispatching_priority[work_centre])
+        req = order.work_center_RQ.request(priority=order.station_dispatching_priority[work_centre])
         req.self = order
-        order.order_start_time[work_centre] = self.sim.env.now
+        order.station_order_start_time[work_centre] = self.sim.env.now
 
         # yield a request
         with req as req:
             yield req
             # Request is finished, order is put into the que or directly processed
-            yield self.sim.env.timeout(order.process_time[work_centre])
+            yield self.sim.env.timeout(order.station_process_time[work_centre])
             # order is finished and released from the machine
 
-        # update the routing list to avoid re-entrance
-        order.machine_route[work_centre] = "PASSED"
-        order.routing_sequence.remove(work_centre)
+        self.operation_finished(order=order, work_centre=work_centre)
+        return
+
+    # the operation as events of the calendar engine -------------------------------------------------------------------
+    def request_capacity(self, order, work_centre):
+        """
+        request the capacity source, the counterpart of the start of the capacity process
+        :param order: order object
+        :param work_centre: work_center number indicating the number of the capacity source
+        :return: void
+        """
+        order.work_center_RQ = self.sim.model_panel.MANUFACTURING_FLOOR[work_centre]
+        order.work_center_RQ.request(user=order, priority=order.station_dispatching_priority[work_centre],
+                                     callback=self.start_processing, args=(order, work_centre))
+        order.station_order_start_time[work_centre] = self.sim.env.now
+        return
+
+    def start_processing(self, order, work_centre):
+        self.sim.env.schedule(order.station_process_time[work_centre], self.finish_processing, args=(order, work_centre))
+        return
+
+    def finish_processing(self, order, work_centre):
+        order.work_center_RQ.release(user=order)
+        self.operation_finished(order=order, work_centre=work_centre)
+        return
+
+    def operation_finished(self, order, work_centre):
+        """
+        update the order and the work centre after the operation
+        :param order: order object
+        :param work_centre: work_center number indicating the number of the capacity source
+        :return: void
+        """
+        # move to the next step of the routing to avoid re-entrance
+        order.station_passed[work_centre] = True
+        order.routing_step += 1
 
         # release control
         if self.sim.policy_panel.release_control:
@@ -198,7 +261,7 @@ class Process(object):
         self.data_collection_intermediate(order=order, work_center=work_centre)
 
         # next action for the order
-        if len(order.routing_sequence) == 0:
+        if order.routing_step == len(order.routing):
             self.data_collection_final(order=order)
         else:
             # activate new release
@@ -215,8 +278,9 @@ class Process(object):
         :param work_center: work_center number indicating the number of the capacity source
         :return: void
         """
-        order.proc_finished_time[work_center] = self.sim.env.now
-        order.queue_time[work_center] = order.order_start_time[work_center] - order.queue_entry_time[work_center]
+        order.station_proc_finished_time[work_center] = self.sim.env.now
+        order.station_queue_time[work_center] = \
+            order.station_order_start_time[work_center] - order.station_queue_entry_time[work_center]
         return
 
     def data_collection_final(self, order):
@@ -241,27 +305,51 @@ class Process(object):
         # General data collection
         self.sim.data_exp.order_output_counter += 1
         self.sim.data_run.accumulated_process_time += order.process_time_cumulative
+        self.sim.data_run.operation_counter += len(order.routing)
 
-        # setup list
-        df_list = list()
+        # lifecycle of the order
+        if self.sim.order_trace is not None:
+            self.sim.order_trace.write_order(order=order)
+
+        # time series for the warm-up detection
+        if self.sim.warm_up_pilot and self.sim.model_panel.WARM_UP_SERIES == "throughput_time":
+            self.sim.warm_up_detection.collect_throughput_time(order=order)
 
         if self.sim.model_panel.COLLECT_BASIC_DATA:
-            df_list.append(order.identifier)
-            df_list.append(order.finishing_time - order.entry_time)
-            df_list.append(order.pool_time)
-            df_list.append(order.finishing_time - order.release_time)
-            df_list.append(order.finishing_time - order.due_date)
-            df_list.append(max(0, (order.finishing_time - order.due_date)))
-            df_list.append(max(0, self.heavenside(x=(order.finishing_time - order.due_date))))
-
-            if self.sim.model_panel.COLLECT_STATION_DATA:
-                    for i, work_center in enumerate(self.sim.model_panel.MANUFACTURING_FLOOR_LAYOUT):
-                        if work_center in order.routing_sequence_data:
-                            df_list.append(order.queue_time[work_center])
-                        else:
-                            df_list.append(np.nan)
-        # save list
-        self.sim.data_collection.append_run_list(result_list=df_list)
+            # the station data of a large shop is only updated for the work centres of the routing
+            station_statistics = self.sim.data_run.station_statistics
+            if station_statistics is not None:
+                for work_center in order.routing:
+                    station_statistics[work_center].update(order.station_queue_time[work_center])
+
+            if self.sim.model_panel.SUMMARY_DATA_ONLY:
+                # update the running statistics of the measures
+                statistics = self.sim.data_run.order_statistics
+                statistics[1].update(order.finishing_time - order.entry_time)
+                statistics[2].update(order.pool_time)
+                statistics[3].update(order.finishing_time - order.release_time)
+                statistics[4].update(order.finishing_time - order.due_date)
+                statistics[5].update(max(0, (order.finishing_time - order.due_date)))
+                statistics[6].update(max(0, self.heavenside(x=(order.finishing_time - order.due_date))))
+
+                if self.sim.model_panel.COLLECT_STATION_DATA and station_statistics is None:
+                    for work_center in order.routing:
+                        statistics[7 + work_center].update(order.station_queue_time[work_center])
+                return
+
+            # write the record of the order, unvisited work centres remain NaN
+            record = self.sim.data_run.order_records.new_record()
+            record[0] = order.identifier
+            record[1] = order.finishing_time - order.entry_time
+            record[2] = order.pool_time
+            record[3] = order.finishing_time - order.release_time
+            record[4] = order.finishing_time - order.due_date
+            record[5] = max(0, (order.finishing_time - order.due_date))
+            record[6] = max(0, self.heavenside(x=(order.finishing_time - order.due_date)))
+
+            if self.sim.model_panel.COLLECT_STATION_DATA and station_statistics is None:
+                for work_center in order.routing:
+                    record[7 + work_center] = order.station_queue_time[work_center]
         return
 
     def heavenside(self, x):
@@ -3,13 +3,15 @@ Project: ProcessSim
 Made By: Arno Kasper
 Version: 1.0.0
 """
-from operator import itemgetter
+import numpy as np
 
 class ReleaseControl(object):
     def __init__(self, simulation):
         self.sim = simulation
         self.pool = self.sim.model_panel.ORDER_POOL
         self.customized_control = self.sim.model_panel.CUSTOM_CONTROL
+        self.release_requested = False  # a release evaluation is scheduled at the current time
+        self.starving_work_centres = dict()  # work centres that triggered LUMS COR since the last evaluation
 
     def order_pool(self, order):
         """
@@ -25,7 +27,7 @@ class ReleaseControl(object):
             if self.sim.policy_panel.sequencing_rule == "FCFS":
                 seq_priority = order.identifier
             elif self.sim.policy_panel.sequencing_rule == "SPT":
-                seq_priority = list(order.process_time.values())[0]
+                seq_priority = order.station_process_time[order.routing[0]]
             elif self.sim.policy_panel.sequencing_rule == "PRD":
                 seq_priority = order.PRD
             else:
@@ -33,21 +35,56 @@ class ReleaseControl(object):
 
         # Put each job in the pool
         job = [order, seq_priority, 1]
-        self.pool.put(job)
+        self.pool.put(job, sequence=not self.sim.policy_panel.sequencing_rule == "FCFS")
 
         # release mechanisms
         if self.sim.policy_panel.release_control_method == "LUMS_COR":
             # feedback mechanism for continuous release
-            work_center = order.routing_sequence[0]
-            if self.control_queue_empty(work_center=work_center):
-                order.process = self.sim.env.process(
-                    self.sim.release_control.continuous_trigger(work_center=work_center))
+            self.continuous_trigger_activation(work_center=order.routing[0])
+        elif self.sim.policy_panel.release_control_method == "pure_continuous" or \
+                self.sim.policy_panel.release_control_method == "CONWIP" or \
+                self.sim.policy_panel.release_control_method == "CONLOAD":
+            self.request_release()
+        return
+
+    def request_release(self, work_center=None):
+        """
+        mark the release decision as out of date. The release is evaluated once, in an event at the current time, for
+        all requests until then
+        :param work_center: starving work centre that triggered LUMS COR, None for the other methods
+        :return: void
+        """
+        if work_center is not None:
+            self.starving_work_centres[work_center] = None
+        if self.release_requested:
+            return
+        self.release_requested = True
+        if self.sim.model_panel.SIMULATION_ENGINE == "calendar":
+            self.sim.env.schedule(0, self.evaluate_release)
+        else:
+            self.sim.env.timeout(0).callbacks.append(self.evaluate_release)
+        return
+
+    def evaluate_release(self, event=None):
+        """
+        release the orders for all release requests at once and hand them to the shop floor as a batch
+        :param event: the SimPy event of the evaluation, None for the calendar engine
+        :return: void
+        """
+        self.release_requested = False
+        released_orders = []
+        if self.sim.policy_panel.release_control_method == "LUMS_COR":
+            work_centres = list(self.starving_work_centres)
+            self.starving_work_centres.clear()
+            for work_center in work_centres:
+                released_orders += self.continuous_trigger(work_center=work_center)
         elif self.sim.policy_panel.release_control_method == "pure_continuous":
-            order.process = self.sim.env.process(self.sim.release_control.continuous_release())
+            released_orders = self.continuous_release()
         elif self.sim.policy_panel.release_control_method == "CONWIP":
-            order.process = self.sim.env.process(self.sim.release_control.CONWIP())
+            released_orders = self.CONWIP()
         elif self.sim.policy_panel.release_control_method == "CONLOAD":
-            order.process = self.sim.env.process(self.sim.release_control.CONLOAD())
+            released_orders = self.CONLOAD()
+        self.sim.process.release_orders(orders=released_orders)
         return
 
     def control_queue_empty(self, work_center):
@@ -56,7 +93,7 @@ class ReleaseControl(object):
         :param: work_center:
         :return: bool
         """
-        in_system = len(self.sim.model_panel.ORDER_QUEUES[work_center].items) + \
+        in_system = len(self.sim.model_panel.ORDER_QUEUES[work_center]) + \
                     len(self.sim.model_panel.MANUFACTURING_FLOOR[work_center].users)
         return in_system <= self.sim.policy_panel.continuous_trigger
 
@@ -65,12 +102,8 @@ class ReleaseControl(object):
         remove flow item from the pool
         :param release_now: list with parameters of the flow item
         """
-        # create a variable that is equal to a item that is removed from the pool
-        release_now[2] = 0
-        # sort the queue
-        self.pool.items.sort(key=itemgetter(2))
         # remove flow item from pool
-        self.pool.get()
+        self.pool.remove(release_now)
 
     def periodic_release(self):
         """
@@ -79,127 +112,142 @@ class ReleaseControl(object):
         periodic_interval = self.sim.policy_panel.check_period
         while True:
             yield self.sim.env.timeout(periodic_interval)
-            # Reset the list of released orders
-            release_now = []
+            self.sim.process.release_orders(orders=self.aggregate_load_release())
 
-            # Sequence the orders currently in the pool
-            if not self.sim.policy_panel.sequencing_rule == "FCFS":
-                self.pool.items.sort(key=itemgetter(1))
+    def periodic_release_event(self):
+        """
+        periodic release as events of the calendar engine, schedules the next release
+        """
+        self.sim.env.schedule(self.sim.policy_panel.check_period, self.periodic_release_check)
 
-            # Contribute the load from each item in the pool
-            for i, order_list in enumerate(self.pool.items):
-                order = order_list[0]
+    def periodic_release_check(self):
+        self.sim.process.release_orders(orders=self.aggregate_load_release())
+        self.periodic_release_event()
 
-                # release workload element --------------------------------------------------------------------------
-                # Contribute the load from for each workstation
-                for WC in order.routing_sequence:
-                    self.sim.model_panel.RELEASED[WC] += order.process_time[WC] / (order.routing_sequence.index(WC) + 1)
+    def continuous_release(self):
+        """
+        Workload Control: continuous release using aggregate load. See workings in Thürer et al, 2012
+        :return: list with the released orders
+        """
+        return self.aggregate_load_release()
 
-                order.release = True
+    def aggregate_load_release(self):
+        """
+        release all orders from the pool that fit within the norms using the corrected aggregate load. The load of
+        each order is compared to the norm for all work centres at once
+        :return: list with the released orders
+        """
+        if self.sim.model_panel.LARGE_SHOP:
+            return self.aggregate_load_release_sparse()
 
-                # The new load is compared to the norm
-                for WC in order.routing_sequence:
-                    if self.sim.model_panel.RELEASED[WC] - self.sim.model_panel.PROCESSED[WC] \
-                            > self.sim.policy_panel.release_norm:
-                        order.release = False
+        # Reset the list of released orders
+        release_now = []
 
-                # If a norm has been violated the job is not released and the contributed load set back
-                if not order.release:
-                    for WC in order.routing_sequence:
-                        self.sim.model_panel.RELEASED[WC] -= order.process_time[WC] / (
-                                order.routing_sequence.index(WC) + 1)
+        # get the workload measures
+        released = np.array(self.sim.model_panel.RELEASED)
+        processed = np.array(self.sim.model_panel.PROCESSED)
+        norm = self.sim.policy_panel.release_norm
+        all_norms_reached = bool(np.all(released - processed > norm))
 
-                # The released orders are collected into a list for release
-                if order.release:
-                    # Orders for released are collected into a list
-                    release_now.append(order_list)
+        # Contribute the load from each item in the pool
+        for i, order_list in enumerate(self.pool.items):
+            # no order can be released if all work centres exceed the norm
+            if all_norms_reached:
+                break
+            order = order_list[0]
 
-                    # The orders are send to the process
-                    self.sim.process.put_in_queue(order=order)
+            # Contribute the load from for each workstation and compare the new load to the norm
+            new_released = released + order.corrected_load
+            order.release = not np.any((new_released - processed > norm) & order.routing_mask)
 
-            # The released orders are removed from the pool using the remove from pool method
-            for _, jobs in enumerate(release_now):
-                self.sim.release_control.remove_from_pool(release_now=jobs)
+            # The released orders are collected into a list for release
+            if order.release:
+                released = new_released
+                all_norms_reached = bool(np.all(released - processed > norm))
 
-    def continuous_release(self):
+                # Orders for released are collected into a list
+                release_now.append(order_list)
+
+        # update the released load
+        self.sim.model_panel.RELEASED[:] = released.tolist()
+
+        # The released orders are removed from the pool using the remove from pool method
+        for _, jobs in enumerate(release_now):
+            self.sim.release_control.remove_from_pool(release_now=jobs)
+        return [jobs[0] for jobs in release_now]
+
+    def aggregate_load_release_sparse(self):
         """
-        Workload Control: continuous release using aggregate load. See workings in Thürer et al, 2012
+        aggregate load release of a large shop, the same decisions as aggregate_load_release. The load of each order
+        is only compared to the norm for the work centres of its routing and the work centres that exceed the norm are
+        counted
+        :return: list with the released orders
         """
         # Reset the list of released orders
         release_now = []
 
-        # Sequence the orders currently in the pool
-        if not self.sim.policy_panel.sequencing_rule == "FCFS":
-            self.pool.items.sort(key=itemgetter(1))
+        # get the workload measures
+        released = self.sim.model_panel.RELEASED
+        processed = self.sim.model_panel.PROCESSED
+        norm = self.sim.policy_panel.release_norm
+        number_above_norm = sum(1 for WC in range(len(released)) if released[WC] - processed[WC] > norm)
 
         # Contribute the load from each item in the pool
-        for i, order_list in enumerate(self.pool.items):
+        for order_list in self.pool.items:
+            # no order can be released if all work centres exceed the norm
+            if number_above_norm == len(released):
+                break
             order = order_list[0]
 
-            # release workload element
-            # Contribute the load from for each workstation
-            for WC in order.routing_sequence:
-                self.sim.model_panel.RELEASED[WC] += order.process_time[WC] / (order.routing_sequence.index(WC) + 1)
-
+            # compare the new load to the norm for each work centre of the routing
             order.release = True
-
-            # The new load is compared to the norm
-            for WC in order.routing_sequence:
-                if self.sim.model_panel.RELEASED[WC] - self.sim.model_panel.PROCESSED[WC] > \
-                        self.sim.policy_panel.release_norm:
+            for WC in order.routing:
+                if released[WC] + order.corrected_load[WC] - processed[WC] > norm:
                     order.release = False
-
-            # If a norm has been violated the job is not released and the contributed load set back
-            if not order.release:
-                for WC in order.routing_sequence:
-                    self.sim.model_panel.RELEASED[WC] -= order.process_time[WC] / (order.routing_sequence.index(WC) + 1)
+                    break
 
             # The released orders are collected into a list for release
             if order.release:
-                # Orders for released are collected into a list
+                for WC in order.routing:
+                    above_norm = released[WC] - processed[WC] > norm
+                    released[WC] += order.corrected_load[WC]
+                    if not above_norm and released[WC] - processed[WC] > norm:
+                        number_above_norm += 1
                 release_now.append(order_list)
 
-                # The orders are send to the process
-                self.sim.process.put_in_queue(order=order)
-
         # The released orders are removed from the pool using the remove from pool method
-        for _, jobs in enumerate(release_now):
+        for jobs in release_now:
             self.sim.release_control.remove_from_pool(release_now=jobs)
+        return [jobs[0] for jobs in release_now]
 
     def continuous_trigger(self, work_center):
         """
         Workload Control: continuous release using aggregate load. See workings in Thürer et al, 2014.
         Part of LUMS COR
+        :return: list with the released order, empty if no order is released
         """
-        while True:
-            # empty the release list
-            trigger = 1
-            # sort orders in the pool
-            if not self.sim.policy_panel.sequencing_rule == "FCFS":
-                self.pool.items.sort(key=itemgetter(1))
-
-            # control if there is any order available for the starving work centre from all items in the pool
-            for i, order_list in enumerate(self.pool.items):
-                order = order_list[0]
-
-                # if there is an order available, than it can be released
-                if order.routing_sequence[0] == work_center and trigger == 1:
-                    trigger += 1
-                    self.sim.data_run.ContLUMSCORCounter += 1
-                    # contribute the load to the workload measures
-                    for WC in order.routing_sequence:
-                        self.sim.model_panel.RELEASED[WC] += order.process_time[WC] / (
-                                order.routing_sequence.index(WC) + 1)
-                        order.release = True
-                        # if an order turned out to be released, it is send to be removed from the pool
-                    if order.release:
-                        order.continuous_trigger = True
-                        # Send the order to the starting work centre
-                        self.sim.process.put_in_queue(order=order)
-                        # release order from the pool
-                        self.sim.release_control.remove_from_pool(release_now=order_list)
-            return
-            yield
+        # the work centre may be supplied since the trigger
+        if not self.control_queue_empty(work_center=work_center):
+            return []
+
+        # control if there is any order available for the starving work centre from all items in the pool
+        order_list = self.pool.first(work_centre=work_center)
+
+        # if there is an order available, than it can be released
+        if order_list is not None:
+            order = order_list[0]
+            self.sim.data_run.ContLUMSCORCounter += 1
+            # contribute the load to the workload measures
+            for WC in order.routing[order.routing_step:]:
+                self.sim.model_panel.RELEASED[WC] += order.corrected_load[WC]
+                order.release = True
+                # if an order turned out to be released, it is send to be removed from the pool
+            if order.release:
+                order.continuous_trigger = True
+                # release order from the pool
+                self.sim.release_control.remove_from_pool(release_now=order_list)
+                return [order]
+        return []
 
     def continuous_trigger_activation(self, work_center):
         """
@@ -208,93 +256,77 @@ class ReleaseControl(object):
         """
         # control the if the the amount of orders in or before the work centre is equal or less than one
         if self.control_queue_empty(work_center=work_center):
-            self.sim.env.process(self.sim.release_control.continuous_trigger(work_center=work_center))
+            self.request_release(work_center=work_center)
 
     def CONWIP(self):
         """
         Constant Work In Process. Fixed amount of flow units in the system, see Spearman et al. (1998)
+        :return: list with the released orders
         """
-        while True:
-            # Reset the list of released order
-            release_now = []
-
-            # Sequence the orders currently in the pool
-            if not self.sim.policy_panel.sequencing_rule == "FCFS":
-                self.pool.items.sort(key=itemgetter(1))
-
-            # Contribute the load from each item in the pool
-            for i, order_list in enumerate(self.pool.items):
-                order = order_list[0]
+        # Reset the list of released order
+        release_now = []
 
-                # Contribute the load from for each workstation
-                self.sim.model_panel.RELEASED["WC1"] += 1
-                order.Release = True
+        # Contribute the load from each item in the pool
+        for i, order_list in enumerate(self.pool.items):
+            order = order_list[0]
 
-                # The new load is compared to the norm
-                if self.sim.model_panel.RELEASED["WC1"] - self.sim.model_panel.PROCESSED["WC1"] > \
-                        self.sim.policy_panel.release_norm:
-                    order.Release = False
+            # Contribute the load from for each workstation
+            self.sim.model_panel.RELEASED[1] += 1
+            order.Release = True
 
-                # If a norm has been violated the job is not released and the contributed load set back
-                if not order.Release:
-                    self.sim.model_panel.RELEASED["WC1"] -= 1
+            # The new load is compared to the norm
+            if self.sim.model_panel.RELEASED[1] - self.sim.model_panel.PROCESSED[1] > \
+                    self.sim.policy_panel.release_norm:
+                order.Release = False
 
-                # The released orders are collected into a list for release
-                elif order.Release:
-                    # Orders for released are collected into a list
-                    release_now.append(order_list)
+            # If a norm has been violated the job is not released and the contributed load set back
+            if not order.Release:
+                self.sim.model_panel.RELEASED[1] -= 1
 
-                    # The orders are send to the manufacturing
-                    self.sim.process.put_in_queue(order=order)
+            # The released orders are collected into a list for release
+            elif order.Release:
+                # Orders for released are collected into a list
+                release_now.append(order_list)
 
-            # The released orders are removed from the pool using the remove from pool method
-            for _, jobs in enumerate(release_now):
-                self.sim.release_control.remove_from_pool(release_now=jobs)
-            return
-            yield
+        # The released orders are removed from the pool using the remove from pool method
+        for _, jobs in enumerate(release_now):
+            self.sim.release_control.remove_from_pool(release_now=jobs)
+        return [jobs[0] for jobs in release_now]
 
-    def CONLOAD(self, sim, pool):
+    def CONLOAD(self):
         """
         Constant Work In Workload. Fixed amount of process time in the system, see Spearman et al. (1998)
+        :return: list with the released orders
         """
-        while True:
-            # Reset the list of released orders
-            release_now = []
-
-            # Sequence the orders currently in the pool
-            if not sim.policy_panel.sequencing_rule == "FCFS":
-                self.pool.items.sort(key=itemgetter(1))
-
-            # Contribute the load from each item in the pool
-            for i, order_list in enumerate(self.pool.items):
-                order = order_list[0]
+        # Reset the list of released orders
+        release_now = []
 
-                # Contribute the load from for each workstation ["WC1"] --> only use the first value of the library
-                self.sim.model_panel.RELEASED["WC1"] += order.process_time_cumulative
-                order.Release = True
+        # Contribute the load from each item in the pool
+        for i, order_list in enumerate(self.pool.items):
+            order = order_list[0]
 
-                # The new load is compared to the norm
-                if self.sim.model_panel.RELEASED["WC1"] - self.sim.model_panel.PROCESSED["WC1"] > \
-                        self.sim.policy_panel.release_norm:
-                    order.Release = False
+            # Contribute the load from for each workstation [1] --> only use the first value of the library
+            self.sim.model_panel.RELEASED[1] += order.process_time_cumulative
+            order.Release = True
 
-                # If a norm has been violated the job is not released and the contributed load set back
-                if not order.Release:
-                    GVar.RELEASED["WC1"] -= order.process_time_cumulative
+            # The new load is compared to the norm
+            if self.sim.model_panel.RELEASED[1] - self.sim.model_panel.PROCESSED[1] > \
+                    self.sim.policy_panel.release_norm:
+                order.Release = False
 
-                # The released orders are collected into a list for release
-                elif order.Release:
-                    # Orders for released are collected into a list
-                    release_now.append(order_list)
+            # If a norm has been violated the job is not released and the contributed load set back
+            if not order.Release:
+                self.sim.model_panel.RELEASED[1] -= order.process_time_cumulative
 
-                    # The orders are send to the process
-                    self.sim.process.put_in_queue(order=order)
+            # The released orders are collected into a list for release
+            elif order.Release:
+                # Orders for released are collected into a list
+                release_now.append(order_list)
 
-            # The released orders are removed from the pool using the remove from pool method
-            for _, jobs in enumerate(release_now):
-                self.sim.release_control.remove_from_pool(release_now=jobs)
-            return
-            yield
+        # The released orders are removed from the pool using the remove from pool method
+        for _, jobs in enumerate(release_now):
+            self.sim.release_control.remove_from_pool(release_now=jobs)
+        return [jobs[0] for jobs in release_now]
 
     def finished_load(self, order, work_center):
         """
@@ -303,14 +335,21 @@ class ReleaseControl(object):
         :param work_center:
         :return:
         """
-        # remove load
-        if self.sim.policy_panel.release_control_method == "CONWIP" and len(order.routing_sequence == 0):
-            self.sim.model_panel.PROCESSED["WC1"] += 1
-        elif self.sim.policy_panel.release_control_method == "CONLOAD" and len(order.routing_sequence == 0):
-            self.sim.model_panel.PROCESSED["WC1"] += order.process_time_cumulative
+        # remove load, CONWIP and CONLOAD count the finished orders only
+        if self.sim.policy_panel.release_control_method == "CONWIP":
+            if order.routing_step == len(order.routing):
+                self.sim.model_panel.PROCESSED[1] += 1
+                self.request_release()
+        elif self.sim.policy_panel.release_control_method == "CONLOAD":
+            if order.routing_step == len(order.routing):
+                self.sim.model_panel.PROCESSED[1] += order.process_time_cumulative
+                self.request_release()
         else:
-            self.sim.model_panel.PROCESSED[work_center] += order.process_time[work_center] / (
-                    order.routing_sequence_data.index(work_center) + 1)
+            self.sim.model_panel.PROCESSED[work_center] += order.corrected_load[work_center]
+            # continuous release after each operation
+            if self.sim.policy_panel.release_control_method == "pure_continuous":
+                self.request_release()
+
         # continuous trigger LUMS COR
         if self.sim.policy_panel.release_control_method == "LUMS_COR":
             self.sim.release_control.continuous_trigger_activation(work_center=work_center)
@@ -0,0 +1,186 @@
+"""
+Project: ProcessSim
+Made By: Arno Kasper
+Version: 1.0.0
+"""
+import hashlib
+import json
+import os
+import pickle
+import sys
+
+# settings that do not change the results of an experiment
+IGNORED_SETTINGS = {"experiment_number",
+                    "print_info",
+                    "project_name",
+                    "experiment_name",
+                    "REPLICATION_WORKERS",
+                    "RESULTS_FORMAT",
+                    "RESULTS_CACHE",
+                    "RESULTS_CACHE_DIRECTORY",
+                    "RESULTS_CACHE_SIZE",
+                    "CHECKPOINT_RUNS",
+                    "CHECKPOINT_DIRECTORY",
+                    "RESUME",
+                    "INSTRUMENTATION",
+                    "INSTRUMENTATION_FILE",
+                    "ORDER_TRACE",
+                    "ORDER_TRACE_FILE"}
+
+# modules that organise the experiments, the other modules are the model code
+EXPERIMENT_MODULES = {"benchmark.py",
+                      "checkpoint.py",
+                      "exp_batch_manager.py",
+                      "exp_manager.py",
+                      "exp_manager_file_creater.py",
+                      "exp_paramaters.py",
+                      "resultcache.py",
+                      "resultstore.py"}
+
+
+def plain_value(value):
+    """
+    convert numpy scalars to python values, used as default of the JSON encoder
+    :param value: value that is not a plain python value
+    :return: python value
+    """
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value)} is not a plain value")
+
+
+def panel_settings(panel):
+    """
+    the settings of a control panel that are plain values. Objects of the model, such as the queues, are left out
+    :param panel: ModelPanel or PolicyPanel object
+    :return: dictionary with the settings
+    """
+    settings = dict()
+    for name, value in vars(panel).items():
+        if name in IGNORED_SETTINGS:
+            continue
+        try:
+            settings[name] = json.loads(json.dumps(value, default=plain_value))
+        except (TypeError, ValueError):
+            continue
+    return settings
+
+
+def code_version():
+    """
+    :return: hash of the source of the model modules
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    code_hash = hashlib.sha256()
+    for file in sorted(os.listdir(directory)):
+        if file.endswith(".py") and file not in EXPERIMENT_MODULES:
+            code_hash.update(file.encode())
+            with open(os.path.join(directory, file), "rb") as source:
+                code_hash.update(source.read())
+    return code_hash.hexdigest()
+
+
+def experiment_key(simulation):
+    """
+    identify an experiment by its settings, seed and model code instead of its experiment number
+    :param simulation: simulation object, before the simulation is run
+    :return: hexadecimal key
+    """
+    experiment = {"model_panel": panel_settings(simulation.model_panel),
+                  "policy_panel": panel_settings(simulation.policy_panel),
+                  "seed": simulation.seed,
+                  "code_version": code_version()}
+    return hashlib.sha256(json.dumps(experiment, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache(object):
+    def __init__(self, directory, max_size):
+        """
+        cache on disk with the results of experiments, a file for each experiment key. When the cache exceeds the
+        maximum size, the least recently used results are removed
+        :param directory: directory of the cache
+        :param max_size: maximum size of the cache in megabytes
+        """
+        self.directory = directory
+        self.max_size = max_size * 1024 ** 2
+        os.makedirs(self.directory, exist_ok=True)
+
+    def file(self, key):
+        return os.path.join(self.directory, key + ".pkl")
+
+    def get(self, key):
+        """
+        :param key: experiment key
+        :return: the stored result, None if the key is unknown
+        """
+        try:
+            with open(self.file(key), "rb") as file:
+                result = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+        # mark as recently used
+        os.utime(self.file(key))
+        return result
+
+    def put(self, key, result):
+        """
+        store the result of an experiment
+        :param key: experiment key
+        :param result: dictionary with the result
+        :return: void
+        """
+        temporary_file = self.file(key) + f".{os.getpid()}.tmp"
+        with open(temporary_file, "wb") as file:
+            pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_file, self.file(key))
+        self.evict()
+        return
+
+    def evict(self):
+        """
+        remove the least recently used results until the cache fits the maximum size
+        :return: void
+        """
+        entries = list()
+        for file in os.listdir(self.directory):
+            if file.endswith(".pkl"):
+                status = os.stat(os.path.join(self.directory, file))
+                entries.append((status.st_mtime, status.st_size, file))
+        size = sum(entry[1] for entry in entries)
+
+        for _, file_size, file in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.directory, file))
+            except FileNotFoundError:
+                pass
+            size -= file_size
+        return
+
+    def invalidate(self, keys=None):
+        """
+        remove results from the cache
+        :param keys: experiment keys to remove, all results if None
+        :return: number of removed results
+        """
+        if keys is None:
+            keys = [file[:-len(".pkl")] for file in os.listdir(self.directory) if file.endswith(".pkl")]
+
+        removed = 0
+        for key in keys:
+            try:
+                os.remove(self.file(key))
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+if __name__ == "__main__":
+    # usage: python resultcache.py invalidate <directory> [key ...]
+    if len(sys.argv) < 3 or sys.argv[1] != "invalidate":
+        raise Exception("Please indicate: invalidate <directory> [key ...]")
+    number_removed = ResultCache(directory=sys.argv[2], max_size=0).invalidate(keys=sys.argv[3:] or None)
+    print(f"{number_removed} results removed from {sys.argv[2]}")
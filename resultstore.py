@@ -0,0 +1,170 @@
+"""
+Project: ProcessSim
+Made By: Arno Kasper
+Version: 1.0.0
+"""
+import queue
+import sqlite3
+import threading
+import pandas as pd
+
+from resultcache import plain_value
+
+
+def read_results(file, exp_number=None):
+    """
+    read the run data from a result store
+    :param file: SQLite file of the result store
+    :param exp_number: the experiment number, all experiments if None
+    :return: dataframe with a row for each run
+    """
+    connection = sqlite3.connect(file)
+    try:
+        if exp_number is None:
+            return pd.read_sql_query("SELECT * FROM runs ORDER BY exp_number, run", connection)
+        return pd.read_sql_query("SELECT * FROM runs WHERE exp_number = ? ORDER BY run", connection,
+                                 params=(exp_number,))
+    finally:
+        connection.close()
+
+
+class ResultStore(object):
+    def __init__(self, file):
+        """
+        SQLite store with a row for each run, indexed by experiment number and run. The rows are written by a
+        background thread, adding a run only puts it in the write queue
+        :param file: SQLite file, shared by the experiments of a project
+        """
+        self.file = file
+        self.write_queue = queue.Queue()
+        self.error = None
+        self.columns = set()
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+
+    def put(self, exp_number, experiment_name, run):
+        """
+        add a run to the write queue
+        :param exp_number: the experiment number
+        :param experiment_name: name of the experiment
+        :param run: dictionary with the measures of the run
+        :return: void
+        """
+        if self.error is not None:
+            raise Exception(f"Result store {self.file} failed") from self.error
+        self.write_queue.put((exp_number, experiment_name, run))
+        return
+
+    def put_frame(self, exp_number, experiment_name, df):
+        """
+        add the runs of an experiment to the write queue
+        :param exp_number: the experiment number
+        :param experiment_name: name of the experiment
+        :param df: dataframe with a row for each run
+        :return: void
+        """
+        for run in df.to_dict(orient="records"):
+            self.put(exp_number=exp_number, experiment_name=experiment_name, run=run)
+        return
+
+    def flush(self):
+        """
+        wait until the runs in the write queue are committed to the file
+        :return: void
+        """
+        committed = threading.Event()
+        self.write_queue.put(committed)
+        while not committed.wait(timeout=1):
+            if not self.writer.is_alive():
+                break
+        if not committed.is_set():
+            raise Exception(f"Result store {self.file} failed") from self.error
+        return
+
+    def close(self):
+        """
+        wait until the write queue is written and stop the writer
+        :return: void
+        """
+        self.write_queue.put(None)
+        self.writer.join()
+        if self.error is not None:
+            raise Exception(f"Result store {self.file} failed") from self.error
+        return
+
+    def write_loop(self):
+        """
+        write the runs in the queue, the runs that are waiting are written in one transaction. The flush events in the
+        queue are set once the runs before them are committed
+        :return: void
+        """
+        connection = None
+        try:
+            connection = sqlite3.connect(self.file, timeout=60)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS runs (exp_number INTEGER, experiment_name TEXT, "
+                               "run INTEGER)")
+            connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS runs_index ON runs (exp_number, run)")
+            connection.commit()
+            self.columns = {row[1] for row in connection.execute("PRAGMA table_info(runs)")}
+
+            finished = False
+            while not finished:
+                items = [self.write_queue.get()]
+                while not self.write_queue.empty():
+                    items.append(self.write_queue.get())
+
+                flush_events = list()
+                with connection:
+                    for item in items:
+                        if item is None:
+                            finished = True
+                            continue
+                        if isinstance(item, threading.Event):
+                            flush_events.append(item)
+                            continue
+                        self.write_run(connection, *item)
+                for committed in flush_events:
+                    committed.set()
+        except Exception as error:
+            self.error = error
+        finally:
+            if connection is not None:
+                connection.close()
+        return
+
+    def write_run(self, connection, exp_number, experiment_name, run):
+        """
+        insert a run, a run that was written before is replaced. Unknown measures are added as columns
+        :param connection: SQLite connection
+        :param exp_number: the experiment number
+        :param experiment_name: name of the experiment
+        :param run: dictionary with the measures of the run
+        :return: void
+        """
+        for name in run:
+            if name not in self.columns:
+                try:
+                    connection.execute(f"ALTER TABLE runs ADD COLUMN {self.quote(name)}")
+                except sqlite3.OperationalError:
+                    # added by another process in the meantime
+                    pass
+                self.columns.add(name)
+
+        names = ["exp_number", "experiment_name"] + [name for name in run if name not in ("exp_number",
+                                                                                          "experiment_name")]
+        values = [exp_number, experiment_name] + [self.value(run[name]) for name in names[2:]]
+        connection.execute(f"INSERT OR REPLACE INTO runs ({', '.join(self.quote(name) for name in names)}) "
+                           f"VALUES ({', '.join('?' for _ in names)})", values)
+        return
+
+    @staticmethod
+    def quote(name):
+        return '"' + str(name).replace('"', '""') + '"'
+
+    @staticmethod
+    def value(value):
+        try:
+            return plain_value(value)
+        except TypeError:
+            return value
@@ -18,7 +18,7 @@ class Source(object):
         self.sim = simulation
         self.stationary = stationary
         self.random_generator = random.Random()
-        self.random_generator.seed(999999)
+        self.random_generator.seed(self.sim.seed)
         self.mean_time_between_arrivals = self.sim.model_panel.MEAN_TIME_BETWEEN_ARRIVAL
 
         if not self.stationary:
@@ -30,34 +30,59 @@ class Source(object):
     def generate_random_arrival_exp(self):
         i = 1
         while True:
-            # count input
-            self.sim.data_exp.order_input_counter += 1
-
-            # create an order object and give it a name
-            order = Order(simulation=self.sim)
-            order.entry_time = self.sim.env.now
-            order.name = ('Order%07d' % i)
-            order.identifier = i
-
-            # release control
-            if self.sim.policy_panel.release_control:
-                self.sim.release_control.order_pool(order=order)
-            else:
-                self.sim.process.put_in_queue(order=order)
-
-            # next inter arrival time
-            if not self.stationary:
-                inter_arrival_time = \
-                    self.sim.random_generator.expovariate(1 / self.non_stationary.current_mean_between_arrival)
-            else:
-                inter_arrival_time = self.random_generator.expovariate(1 / self.mean_time_between_arrivals)
-
-            yield self.sim.env.timeout(inter_arrival_time)
+            self.new_order(identifier=i)
+            yield self.sim.env.timeout(self.inter_arrival_time())
             i += 1
             if self.sim.env.now >= (self.sim.model_panel.WARM_UP_PERIOD + self.sim.model_panel.RUN_TIME) \
                     * self.sim.model_panel.NUMBER_OF_RUNS:
                 break
 
+    def arrival(self, identifier=1):
+        """
+        arrival of an order as event of the calendar engine, schedules the next arrival
+        :param identifier: identifier of the order
+        :return: void
+        """
+        if self.sim.env.now >= (self.sim.model_panel.WARM_UP_PERIOD + self.sim.model_panel.RUN_TIME) \
+                * self.sim.model_panel.NUMBER_OF_RUNS:
+            return
+        self.new_order(identifier=identifier)
+        self.sim.env.schedule(self.inter_arrival_time(), self.arrival, args=(identifier + 1,))
+        return
+
+    def new_order(self, identifier):
+        """
+        create an order and send it to the pool or the floor
+        :param identifier: identifier of the order
+        :return: void
+        """
+        # count input
+        self.sim.data_exp.order_input_counter += 1
+
+        # create an order object and give it an identifier, the name follows from the identifier
+        order = Order(simulation=self.sim)
+        order.entry_time = self.sim.env.now
+        order.identifier = identifier
+
+        # release control
+        if self.sim.policy_panel.release_control:
+            self.sim.release_control.order_pool(order=order)
+        else:
+            self.sim.process.put_in_queue(order=order)
+        return
+
+    def inter_arrival_time(self):
+        """
+        :return: time until the next arrival
+        """
+        if self.sim.variate_streams is not None:
+            if not self.stationary:
+                return self.sim.variate_streams.inter_arrival_time() * self.non_stationary.current_mean_between_arrival
+            return self.sim.variate_streams.inter_arrival_time() * self.mean_time_between_arrivals
+        elif not self.stationary:
+            return self.sim.random_generator.expovariate(1 / self.non_stationary.current_mean_between_arrival)
+        return self.random_generator.expovariate(1 / self.mean_time_between_arrivals)
+
 
 class NonStationaryControl(object):
     def __init__(self, simulation, source):
@@ -70,7 +95,7 @@ class NonStationaryControl(object):
         self.sim = simulation
         self.source = source
         self.random_generator = random.Random()
-        self.random_generator.seed(999999)
+        self.random_generator.seed(self.sim.seed)
 
         self.plot_trajectory = False
         self.print_info = False
@@ -177,6 +202,7 @@ class NonStationaryControl(object):
                         aimed_utilization=self.current_utilization,
                         mean_process_time=self.sim.model_panel.MEAN_PROCESS_TIME,
                         number_of_machines=self.sim.model_panel.NUMBER_OF_MACHINES,
+                        maximum_routing_length=self.sim.model_panel.MAX_ROUTING_LENGTH,
                         cv=self.current_cv)
 
                 if self.print_info:
@@ -546,6 +572,7 @@ class NonStationaryControl(object):
                         aimed_utilization=current_utilization,
                         mean_process_time=self.sim.model_panel.MEAN_PROCESS_TIME,
                         number_of_machines=self.sim.model_panel.NUMBER_OF_MACHINES,
+                        maximum_routing_length=self.sim.model_panel.MAX_ROUTING_LENGTH,
                         cv=self.current_cv)
 
                 # update the time
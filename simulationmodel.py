@@ -5,8 +5,14 @@ Version: 1.0.0
 """
 # set code and import libraries ----------------------------------------------------------------------------------------
 from simpy import Environment, FilterStore, PriorityResource, Event
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice, repeat
 from random import Random
+import time
+import os
 import numpy as np
+import pandas as pd
 from scipy import stats
 from typing import cast, Dict, List, Optional, Tuple, Type, Generator
 
@@ -16,10 +22,55 @@ from typing import cast, Dict, List, Optional, Tuple, Type, Generator
 from controlpanel import ModelPanel, PolicyPanel
 from data_collection_and_storage import DataCollection, DataStorageRun, DataStorageExp
 from generalfunctions import GeneralFunctions
+from instrumentation import Instrumentation
+from ordertrace import OrderTrace
 from simsource import Source
 from process import Process
 from customizedsettings import CustomizedSettings
 from releasecontrol import ReleaseControl
+from variatestream import VariateStreams
+from warmupdetection import WarmUpDetection
+
+def replication_seed(seed: int, replication: int) -> int:
+    """
+    derive an independent seed for a replication from the seed of the experiment
+    :param seed: seed of the experiment
+    :param replication: replication number
+    :return: seed of the replication
+    """
+    return int(np.random.SeedSequence(seed, spawn_key=(replication,)).generate_state(1)[0])
+
+
+def run_replication(exp_number: int, replication: int, seed: int, antithetic_pairs: bool = False,
+                    warm_up_period: Optional[float] = None, model_settings: Optional[Dict[str, any]] = None,
+                    policy_settings: Optional[Dict[str, any]] = None) -> Tuple[pd.DataFrame, int, int]:
+    """
+    run a single independent replication, used as task for the worker processes
+    :param exp_number: the experiment number
+    :param replication: replication number, starting at 1
+    :param seed: seed of the experiment
+    :param antithetic_pairs: if True, every even replication is the antithetic counterpart of the replication before
+    :param warm_up_period: warm-up period of the experiment, the one of the model panel if None
+    :param model_settings: settings of the model panel of the experiment
+    :param policy_settings: settings of the policy panel of the experiment
+    :return: run database, order input counter, order output counter
+    """
+    antithetic = False
+    if antithetic_pairs:
+        seed = replication_seed(seed=seed, replication=(replication + 1) // 2)
+        antithetic = replication % 2 == 0
+    else:
+        seed = replication_seed(seed=seed, replication=replication)
+
+    simulation = SimulationModel(exp_number=exp_number, replication=replication, seed=seed, antithetic=antithetic,
+                                 model_settings=model_settings, policy_settings=policy_settings)
+    if warm_up_period is not None:
+        simulation.model_panel.WARM_UP_PERIOD = warm_up_period
+    simulation.sim_function()
+    database = simulation.data_exp.database
+    database["run"] = replication
+    return database, simulation.data_exp.order_input_counter, simulation.data_exp.order_output_counter
+
 
 class SimulationModel(object):
     """
@@ -27,14 +78,22 @@ class SimulationModel(object):
     the simulation instance (i.e. self) is passed in the other function outside this class as sim
     """
 
-    def __init__(self, exp_number: int = 1) -> None:
+    def __init__(self, exp_number: int = 1, replication: int = 0, seed: int = 999999, antithetic: bool = False,
+                 warm_up_pilot: bool = False, model_settings: Optional[Dict[str, any]] = None,
+                 policy_settings: Optional[Dict[str, any]] = None) -> None:
         # setup general params
         self.exp_number: int = exp_number
+        self.model_settings: Optional[Dict[str, any]] = model_settings  # replace the defaults of the model panel
+        self.policy_settings: Optional[Dict[str, any]] = policy_settings  # replace the defaults of the policy panel
+        self.replication: int = replication
+        self.warm_up_pilot: bool = warm_up_pilot
         self.warm_up: bool = True
 
         # Set seed for specifically process times and other random generators
+        self.seed: int = seed
+        self.antithetic: bool = antithetic
         self.random_generator: Random = Random()
-        self.random_generator.seed(999999)
+        self.random_generator.seed(self.seed)
 
         # import the Simpy environment
         self.env: Environment = Environment()
@@ -43,17 +102,59 @@ class SimulationModel(object):
         self.general_functions: GeneralFunctions = GeneralFunctions(simulation=self)
 
         # get the model and policy control panel
-        self.model_panel: ModelPanel = ModelPanel(experiment_number=self.exp_number, simulation=self)
-        self.policy_panel: PolicyPanel = PolicyPanel(experiment_number=self.exp_number)
+        self.model_panel: ModelPanel = ModelPanel(experiment_number=self.exp_number, simulation=self,
+                                                  settings=self.model_settings)
+        self.policy_panel: PolicyPanel = PolicyPanel(experiment_number=self.exp_number, settings=self.policy_settings)
         self.print_info: bool = self.model_panel.print_info
 
-        # get the data storage variables
-        self.data_run: DataStorageRun = DataStorageRun(sim=self)
-        self.data_exp: DataStorageExp = DataStorageExp(sim=self)
+        # an independent replication is a simulation with a single run
+        if self.replication > 0:
+            self.model_panel.NUMBER_OF_RUNS = 1
+            self.model_panel.SEQUENTIAL_STOPPING = False
+            self.print_info = False
+        # the pilot run for the warm-up detection is a single run without warm-up period
+        elif self.warm_up_pilot:
+            self.model_panel.NUMBER_OF_RUNS = 1
+            self.model_panel.WARM_UP_PERIOD = 0
+            self.model_panel.RUN_TIME = self.model_panel.WARM_UP_PILOT_TIME
+            self.model_panel.INDEPENDENT_REPLICATIONS = False
+            self.model_panel.SEQUENTIAL_STOPPING = False
+            self.print_info = False
+        # the sequential procedure continues the runs until the stopping criterion is met
+        elif self.model_panel.SEQUENTIAL_STOPPING:
+            # the stopping criterion uses the run data, without it the simulation is never stopped
+            if not self.model_panel.COLLECT_BASIC_DATA:
+                raise Exception("Sequential stopping requires the basic data collection")
+            self.model_panel.NUMBER_OF_RUNS = self.model_panel.MAX_NUMBER_OF_RUNS
+
+        # the replications are merged by their run data, without data collection no run data is stored
+        if self.model_panel.INDEPENDENT_REPLICATIONS and not (self.model_panel.COLLECT_BASIC_DATA or
+                                                              self.model_panel.COLLECT_ORDER_DATA):
+            raise Exception("Independent replications require the basic or order data collection")
+
+        # get the buffered random variate streams, antithetic pairs are made of independent replications
+        if self.model_panel.ANTITHETIC_REPLICATIONS and not self.model_panel.INDEPENDENT_REPLICATIONS and \
+                not self.warm_up_pilot:
+            raise Exception("Antithetic replications require independent replications")
+        if self.model_panel.ANTITHETIC_REPLICATIONS and self.model_panel.NUMBER_OF_RUNS % 2 == 1 and \
+                self.replication == 0 and not self.warm_up_pilot:
+            raise Exception("Antithetic replications require an even number of runs")
+        self.variate_streams: Optional[VariateStreams] = None
+        if self.model_panel.VARIATE_STREAMS:
+            self.variate_streams = VariateStreams(simulation=self)
+        elif self.model_panel.ANTITHETIC_REPLICATIONS:
+            raise Exception("Antithetic replications require the variate streams")
+
+        # add the warm-up detection
+        self.warm_up_detection: WarmUpDetection = WarmUpDetection(simulation=self)
 
         # add data clearing methods
         self.data_collection: DataCollection = DataCollection(simulation=self)
 
+        # get the data storage variables
+        self.data_run: DataStorageRun = DataStorageRun(sim=self)
+        self.data_exp: DataStorageExp = DataStorageExp(sim=self)
+
         # import source
         self.source: Source = Source(simulation=self)
 
@@ -66,10 +167,19 @@ class SimulationModel(object):
         # add the customized settings
         self.customized_settings: CustomizedSettings = CustomizedSettings(simulation=self)
 
+        # add the instrumentation, wraps the entry points of the model only if it is switched on
+        self.instrumentation: Optional[Instrumentation] = None
+        if self.model_panel.INSTRUMENTATION:
+            self.instrumentation = Instrumentation(simulation=self)
+
         # declare variables
         self.release_periodic: any = "declare"
         self.source_process: any = "declare"
         self.run_manager: any = "declare"
+        self.end_simulation: any = "declare"
+        self.start_time: float = 0.0
+        self.checkpoint: any = None  # RunCheckpoint, set by the experiment manager
+        self.order_trace: Optional[OrderTrace] = None
 
     # the actual simulation function with all required SimPy settings---------------------------------------------------
     def sim_function(self) -> None:
@@ -77,20 +187,51 @@ class SimulationModel(object):
         initialling and timing of the generator functions
         :return: void
         """
+        self.start_time = time.time()
+
+        # detect the warm-up period with a pilot run
+        if self.model_panel.WARM_UP_DETECTION is not None and self.replication == 0 and not self.warm_up_pilot:
+            self.model_panel.WARM_UP_PERIOD = self.detect_warm_up()
+
+        # run the replications as separate simulations
+        if self.model_panel.INDEPENDENT_REPLICATIONS and self.replication == 0:
+            self.replication_manager()
+            return
+
+        # the calendar engine starts callbacks instead of SimPy processes
+        calendar = self.model_panel.SIMULATION_ENGINE == "calendar"
+
         # activate release control
         if self.policy_panel.release_control:
             if self.policy_panel.release_control_method == "LUMS_COR" or \
                     self.policy_panel.release_control_method == "pure_periodic":
-                self.release_periodic: Process[Event, None, None] = \
-                    self.env.process(self.release_control.periodic_release())
+                if calendar:
+                    self.env.start(self.release_control.periodic_release_event)
+                else:
+                    self.release_periodic: Process[Event, None, None] = \
+                        self.env.process(self.release_control.periodic_release())
+
+        # collect the time series of the pilot run
+        if self.warm_up_pilot and self.model_panel.WARM_UP_SERIES == "WIP":
+            if calendar:
+                self.env.start(self.warm_up_detection.sample_work_in_process)
+            else:
+                self.env.process(self.warm_up_detection.collect_work_in_process())
 
         # initialize processes
-        self.source_process: Process[Event, None, None] = self.env.process(self.source.generate_random_arrival_exp())
+        if calendar:
+            self.env.start(self.source.arrival)
+        else:
+            self.source_process: Process[Event, None, None] = \
+                self.env.process(self.source.generate_random_arrival_exp())
 
         # activate data collection methods
         if self.model_panel.COLLECT_BASIC_DATA or \
                 self.model_panel.COLLECT_ORDER_DATA:
-            self.run_manager: Process[Event, None, None] = self.env.process(SimulationModel.run_manager(self))
+            if calendar:
+                self.env.start(self.start_run)
+            else:
+                self.run_manager: Process[Event, None, None] = self.env.process(SimulationModel.run_manager(self))
 
         # set the the length of the simulation (add one extra time unit to save result last run)
         if self.print_info:
@@ -99,12 +240,173 @@ class SimulationModel(object):
         # start simulation
         sim_time = (self.model_panel.WARM_UP_PERIOD + self.model_panel.RUN_TIME) * \
                    self.model_panel.NUMBER_OF_RUNS + 0.001
+        # open the order trace, each replication has its own file
+        if self.model_panel.ORDER_TRACE and not self.warm_up_pilot:
+            path = self.model_panel.ORDER_TRACE_FILE
+            if self.replication > 0:
+                root, extension = os.path.splitext(path)
+                path = f"{root}_rep{self.replication}{extension}"
+            self.order_trace = OrderTrace(path=path)
+
+        if self.instrumentation is not None:
+            self.instrumentation.start()
+
+        if self.model_panel.SEQUENTIAL_STOPPING:
+            # the run manager ends the simulation
+            if calendar:
+                self.env.run()
+            else:
+                self.end_simulation = self.env.event()
+                self.env.run(until=self.end_simulation)
+        else:
+            self.env.run(until=sim_time)
+
+        # simulation finished, close the order trace, report the instrumentation and print final info
+        if self.order_trace is not None:
+            self.order_trace.close()
+        if self.instrumentation is not None:
+            self.instrumentation.stop()
+            self.instrumentation.emit()
+        if self.print_info:
+            self.print_end_info()
 
-        self.env.run(until=sim_time)
+    def replication_manager(self) -> None:
+        """
+        Run each replication as an independent, separately seeded simulation with its own warm-up period. The
+        replications are distributed over the worker processes and the run data is merged in order of the runs.
+        :return: void
+        """
+        if self.print_info:
+            self.print_start_info()
+
+        results = list()
+        for result in self.replication_results():
+            results.append(result)
+
+            # update the replication statistics, antithetic pairs are one observation
+            if self.model_panel.COLLECT_BASIC_DATA and not self.model_panel.COLLECT_ORDER_DATA:
+                if not self.model_panel.ANTITHETIC_REPLICATIONS:
+                    self.data_collection.update_replication_statistics(run=result[0].iloc[0])
+                elif len(results) % 2 == 0:
+                    pair = pd.concat([results[-2][0], results[-1][0]], ignore_index=True)
+                    self.data_collection.update_replication_statistics(run=pair.mean(numeric_only=True))
+                else:
+                    continue
+
+            # sequential procedure
+            if self.model_panel.SEQUENTIAL_STOPPING and self.stopping_criterion():
+                break
+
+        # merge the run data
+        for database, order_input_counter, order_output_counter in results:
+            self.data_exp.runs.append_frame(df=database)
+            self.data_exp.order_input_counter += order_input_counter
+            self.data_exp.order_output_counter += order_output_counter
+
+        # estimate the measures with variance reduction
+        if self.model_panel.ANTITHETIC_REPLICATIONS or self.model_panel.CONTROL_VARIATES:
+            self.data_exp.variance_reduction = self.data_collection.variance_reduction_estimates()
 
-        # simulation finished, print final info
         if self.print_info:
+            if self.model_panel.COLLECT_BASIC_DATA:
+                print(self.data_exp.database.to_string(index=False))
+            if self.data_exp.variance_reduction is not None:
+                print(self.data_exp.variance_reduction.to_string(index=False))
             self.print_end_info()
+        return
+
+    def replication_results(self) -> Generator[Tuple[pd.DataFrame, int, int], None, None]:
+        """
+        run the replications and yield the results in order of the runs. At most two replications per worker are
+        submitted ahead of the results that are used.
+        :return: run database, order input counter, order output counter
+        """
+        replications = range(1, self.model_panel.NUMBER_OF_RUNS + 1)
+
+        # replications that finished before a restart are taken from the checkpoint
+        finished = dict()
+        if self.checkpoint is not None:
+            finished = self.checkpoint.finished_replications()
+
+        tasks = zip(repeat(self.exp_number),
+                    [replication for replication in replications if replication not in finished],
+                    repeat(self.seed),
+                    repeat(self.model_panel.ANTITHETIC_REPLICATIONS),
+                    repeat(self.model_panel.WARM_UP_PERIOD),
+                    repeat(self.model_settings),
+                    repeat(self.policy_settings))
+        new_results = self.task_results(tasks=tasks)
+        try:
+            for replication in replications:
+                if replication in finished:
+                    yield finished[replication]
+                    continue
+                result = next(new_results)
+                if self.checkpoint is not None:
+                    self.checkpoint.write_replication(result=result)
+                yield result
+        finally:
+            new_results.close()
+
+    def task_results(self, tasks) -> Generator[Tuple[pd.DataFrame, int, int], None, None]:
+        """
+        run the replication tasks and yield the results in order of the tasks
+        :param tasks: iterator with the arguments of run_replication
+        :return: run database, order input counter, order output counter
+        """
+        if self.model_panel.REPLICATION_WORKERS <= 1:
+            for task in tasks:
+                yield run_replication(*task)
+            return
+
+        executor = ProcessPoolExecutor(max_workers=self.model_panel.REPLICATION_WORKERS)
+        try:
+            futures = deque(executor.submit(run_replication, *task)
+                            for task in islice(tasks, 2 * self.model_panel.REPLICATION_WORKERS))
+            while len(futures) > 0:
+                result = futures.popleft().result()
+                for task in islice(tasks, 1):
+                    futures.append(executor.submit(run_replication, *task))
+                yield result
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def detect_warm_up(self) -> float:
+        """
+        run a pilot simulation with its own random numbers and detect the warm-up period from its time series
+        :return: warm-up period
+        """
+        pilot = SimulationModel(exp_number=self.exp_number,
+                                seed=replication_seed(seed=self.seed, replication=0),
+                                warm_up_pilot=True,
+                                model_settings=self.model_settings,
+                                policy_settings=self.policy_settings)
+        pilot.sim_function()
+        warm_up_period = pilot.warm_up_detection.warm_up_period()
+        if self.print_info:
+            print(f"Detected warm-up period: {warm_up_period}")
+        return warm_up_period
+
+    def stopping_criterion(self) -> bool:
+        """
+        Sequential procedure: stop when the relative half-width of the confidence interval of all sequential
+        measures is reached, when the maximum number of runs is reached or when the wall-clock budget is used.
+        :return: bool
+        """
+        number_of_runs = self.data_exp.replication_statistics["mean_throughput_time"].count
+        if number_of_runs >= self.model_panel.MAX_NUMBER_OF_RUNS:
+            return True
+        if self.model_panel.WALL_CLOCK_BUDGET is not None and \
+                time.time() - self.start_time >= self.model_panel.WALL_CLOCK_BUDGET:
+            return True
+        if number_of_runs < self.model_panel.MIN_NUMBER_OF_RUNS:
+            return False
+        for measure in self.model_panel.SEQUENTIAL_MEASURES:
+            relative_half_width = self.data_exp.replication_statistics[measure].relative_half_width(
+                confidence_level=self.model_panel.CONFIDENCE_LEVEL)
+            if relative_half_width > self.model_panel.RELATIVE_HALF_WIDTH:
+                return False
+        return True
 
     def run_manager(self) -> Generator[Event, None, None]:
         """
@@ -136,6 +438,53 @@ class SimulationModel(object):
             if self.print_info and self.model_panel.COLLECT_BASIC_DATA:
                 self.print_run_info()
 
+            # sequential procedure
+            if self.model_panel.SEQUENTIAL_STOPPING and self.stopping_criterion():
+                break
+
+        # end the simulation of the sequential procedure
+        if self.model_panel.SEQUENTIAL_STOPPING:
+            self.end_simulation.succeed()
+
+    # the run manager as events of the calendar engine -----------------------------------------------------------------
+    def start_run(self) -> None:
+        if self.env.now < (self.model_panel.WARM_UP_PERIOD + self.model_panel.RUN_TIME) * self.model_panel.NUMBER_OF_RUNS:
+            self.env.schedule(self.model_panel.WARM_UP_PERIOD, self.end_warm_up)
+        elif self.model_panel.SEQUENTIAL_STOPPING:
+            self.env.schedule(0, self.env.stop)
+        return
+
+    def end_warm_up(self) -> None:
+        # chance the warm_up status
+        self.warm_up = True
+
+        # print run info if required
+        if self.print_info:
+            self.print_warmup_info()
+
+        # update data
+        self.data_collection.run_update(warmup=self.warm_up)
+        self.env.schedule(self.model_panel.RUN_TIME, self.end_run)
+        return
+
+    def end_run(self) -> None:
+        # chance the warm_up status
+        self.warm_up = False
+
+        # update data
+        self.data_collection.run_update(warmup=self.warm_up)
+
+        # print run info if required
+        if self.print_info and self.model_panel.COLLECT_BASIC_DATA:
+            self.print_run_info()
+
+        # sequential procedure
+        if self.model_panel.SEQUENTIAL_STOPPING and self.stopping_criterion():
+            self.env.schedule(0, self.env.stop)
+            return
+        self.start_run()
+        return
+
     # function that print information to the console
     def print_start_info(self) -> None:
         print("Simulation starts")
@@ -165,16 +514,17 @@ class SimulationModel(object):
         progress = progress + f"] {round(run_number/self.model_panel.NUMBER_OF_RUNS*100,2)}%"
 
         # compute replication confidence
-        current_sum = self.data_exp.database.loc[:,"mean_throughput_time"].sum()
-        current_variance = self.data_exp.database.loc[:,"mean_throughput_time"].var()
-        confidence_int = current_sum - stats.t.ppf(1-0.025,df=self.data_exp.database.shape[0]-1) *\
+        replication_statistics = self.data_exp.replication_statistics["mean_throughput_time"]
+        current_sum = replication_statistics.mean * replication_statistics.count
+        current_variance = replication_statistics.variance()
+        confidence_int = current_sum - stats.t.ppf(1-0.025,df=replication_statistics.count-1) *\
                          (current_variance / np.sqrt(run_number))
         deviation = f"replication confidence: p < {round((current_sum - confidence_int) /current_sum*100, 6)}%"
         print(f"run number {run_number}", progress, deviation)
 
         # print info
-        print(self.data_exp.database.iloc[index:,[0,2,3,4,7,9,10,11,
-                                                  *range(13, self.data_exp.database.shape[1])]].to_string(index=False))
+        database = self.data_exp.runs.frame(start=index)
+        print(database.iloc[:,[0,2,3,4,7,9,10,11, *range(13, database.shape[1])]].to_string(index=False))
         return
 
     def print_end_info(self) -> None:
@@ -0,0 +1,259 @@
+"""
+Project: ProcessSim
+Made By: Arno Kasper
+Version: 1.0.0
+"""
+from functools import partial
+from scipy import stats
+import numpy as np
+
+
+def two_erlang_truncated_block(generator, size, rate, truncation_point):
+    """
+    block of truncated two erlang distributed values, truncation by rejection
+    :param generator: numpy generator
+    :param size: number of values drawn before rejection
+    :param rate: rate of each of the exponential phases
+    :param truncation_point: maximum value
+    :return: list with values
+    """
+    values = generator.gamma(shape=2, scale=1 / rate, size=size)
+    return values[values <= truncation_point].tolist()
+
+
+def log_normal_truncated_block(generator, size, mean, sigma, truncation_point=np.inf, scale=1):
+    """
+    block of truncated log normal distributed values, truncation by rejection
+    :param generator: numpy generator
+    :param size: number of values drawn before rejection
+    :param mean: mean of the underlying normal distribution
+    :param sigma: standard deviation of the underlying normal distribution
+    :param truncation_point: maximum value before scaling
+    :param scale: multiplier of the accepted values
+    :return: list with values
+    """
+    values = generator.lognormal(mean=mean, sigma=sigma, size=size)
+    return (values[values <= truncation_point] * scale).tolist()
+
+
+def exponential_block(generator, size):
+    """
+    block of exponential distributed values with mean 1
+    :param generator: numpy generator
+    :param size: number of values
+    :return: list with values
+    """
+    return generator.standard_exponential(size=size).tolist()
+
+
+def routing_block(generator, size, number_of_work_centres, maximum_length=None):
+    """
+    block of random routings, each routing visits a random number of distinct work centres in random order
+    :param generator: numpy generator
+    :param size: number of routings
+    :param number_of_work_centres: number of work centres in the layout
+    :param maximum_length: maximum number of work centres of a routing, None for all work centres
+    :return: list with lists of work centre indices
+    """
+    if maximum_length is not None and 4 * maximum_length <= number_of_work_centres:
+        return sparse_routing_block(generator=generator, size=size, number_of_work_centres=number_of_work_centres,
+                                    maximum_length=maximum_length)
+    if maximum_length is None:
+        maximum_length = number_of_work_centres
+    lengths = generator.integers(1, min(maximum_length, number_of_work_centres), endpoint=True, size=size).tolist()
+    permutations = generator.permuted(np.tile(np.arange(number_of_work_centres), (size, 1)), axis=1).tolist()
+    return [permutation[:length] for permutation, length in zip(permutations, lengths)]
+
+
+def sparse_routing_block(generator, size, number_of_work_centres, maximum_length):
+    """
+    block of random routings that visit few of the work centres of a large layout. The work centres are drawn with
+    replacement and the repeated ones are skipped, instead of a permutation of the whole layout for each routing
+    :param generator: numpy generator
+    :param size: number of routings
+    :param number_of_work_centres: number of work centres in the layout
+    :param maximum_length: maximum number of work centres of a routing
+    :return: list with lists of work centre indices
+    """
+    lengths = generator.integers(1, maximum_length, endpoint=True, size=size).tolist()
+    draws = generator.integers(0, number_of_work_centres, size=(size, 2 * maximum_length)).tolist()
+    routings = list()
+    for draw, length in zip(draws, lengths):
+        routing = list(dict.fromkeys(draw))[:length]
+        if len(routing) < length:
+            routing = generator.choice(number_of_work_centres, size=length, replace=False).tolist()
+        routings.append(routing)
+    return routings
+
+
+def uniform_block(generator, size, antithetic=False):
+    """
+    block of uniform values on the open interval (0, 1)
+    :param generator: numpy generator
+    :param size: number of values, an integer or a shape
+    :param antithetic: if True, the complementary values 1 - u are returned
+    :return: numpy array with values
+    """
+    uniform = np.clip(generator.random(size=size), np.finfo(float).tiny, 1 - np.finfo(float).epsneg)
+    if antithetic:
+        return 1 - uniform
+    return uniform
+
+
+def two_erlang_truncated_inverse_block(generator, size, rate, truncation_point, antithetic=False):
+    """
+    block of truncated two erlang distributed values by inverse transformation of uniform values
+    :param generator: numpy generator
+    :param size: number of values
+    :param rate: rate of each of the exponential phases
+    :param truncation_point: maximum value
+    :param antithetic: if True, the complementary uniform values are used
+    :return: list with values
+    """
+    distribution = stats.gamma(a=2, scale=1 / rate)
+    uniform = uniform_block(generator=generator, size=size, antithetic=antithetic)
+    return distribution.ppf(uniform * distribution.cdf(truncation_point)).tolist()
+
+
+def log_normal_truncated_inverse_block(generator, size, mean, sigma, truncation_point=np.inf, scale=1,
+                                       antithetic=False):
+    """
+    block of truncated log normal distributed values by inverse transformation of uniform values
+    :param generator: numpy generator
+    :param size: number of values
+    :param mean: mean of the underlying normal distribution
+    :param sigma: standard deviation of the underlying normal distribution
+    :param truncation_point: maximum value before scaling
+    :param scale: multiplier of the values
+    :param antithetic: if True, the complementary uniform values are used
+    :return: list with values
+    """
+    uniform = uniform_block(generator=generator, size=size, antithetic=antithetic)
+    probability_truncation = stats.norm.cdf((np.log(truncation_point) - mean) / sigma)
+    return (np.exp(mean + sigma * stats.norm.ppf(uniform * probability_truncation)) * scale).tolist()
+
+
+def exponential_inverse_block(generator, size, antithetic=False):
+    """
+    block of exponential distributed values with mean 1 by inverse transformation of uniform values
+    :param generator: numpy generator
+    :param size: number of values
+    :param antithetic: if True, the complementary uniform values are used
+    :return: list with values
+    """
+    return (-np.log(uniform_block(generator=generator, size=size, antithetic=antithetic))).tolist()
+
+
+def routing_inverse_block(generator, size, number_of_work_centres, maximum_length=None, antithetic=False):
+    """
+    block of random routings from uniform values. The routing length follows from one uniform value and the
+    sequence from sorting uniform keys, the complementary values give the reversed sequence
+    :param generator: numpy generator
+    :param size: number of routings
+    :param number_of_work_centres: number of work centres in the layout
+    :param maximum_length: maximum number of work centres of a routing, None for all work centres
+    :param antithetic: if True, the complementary uniform values are used
+    :return: list with lists of work centre indices
+    """
+    if maximum_length is None:
+        maximum_length = number_of_work_centres
+    maximum_length = min(maximum_length, number_of_work_centres)
+    uniform = uniform_block(generator=generator, size=(size, number_of_work_centres + 1), antithetic=antithetic)
+    lengths = np.minimum((uniform[:, 0] * maximum_length).astype(int) + 1, maximum_length).tolist()
+    permutations = np.argsort(uniform[:, 1:], axis=1).tolist()
+    return [permutation[:length] for permutation, length in zip(permutations, lengths)]
+
+
+class VariateStream(object):
+    def __init__(self, seed, stream_number, block_function, block_size=4096):
+        """
+        buffered stream of random variates. The values are generated in blocks by a numpy generator with a
+        reproducible seed for each stream and served one at a time
+        :param seed: seed of the simulation
+        :param stream_number: number of the stream, each stream has independent random numbers
+        :param block_function: function(generator, size) returning a list with values
+        :param block_size: number of values generated at once
+        """
+        self.generator = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(stream_number,)))
+        self.block_function = block_function
+        self.block_size = block_size
+        self.buffer = list()
+
+    def __call__(self):
+        """
+        next value of the stream
+        :return: random variate
+        """
+        while len(self.buffer) == 0:
+            self.buffer = self.block_function(self.generator, self.block_size)
+            self.buffer.reverse()
+        return self.buffer.pop()
+
+
+class VariateStreams(object):
+    def __init__(self, simulation):
+        """
+        the random variate streams of the simulation model
+        :param simulation: simulation object
+        """
+        self.sim = simulation
+        block_size = self.sim.model_panel.VARIATE_BLOCK_SIZE
+
+        # antithetic replications require inverse transformation of uniform values
+        inverse_transformation = self.sim.model_panel.ANTITHETIC_REPLICATIONS
+        if inverse_transformation:
+            two_erlang_function = partial(two_erlang_truncated_inverse_block, antithetic=self.sim.antithetic)
+            log_normal_function = partial(log_normal_truncated_inverse_block, antithetic=self.sim.antithetic)
+            exponential_function = partial(exponential_inverse_block, antithetic=self.sim.antithetic)
+            routing_function = partial(routing_inverse_block, antithetic=self.sim.antithetic)
+        else:
+            two_erlang_function = two_erlang_truncated_block
+            log_normal_function = log_normal_truncated_block
+            exponential_function = exponential_block
+            routing_function = routing_block
+
+        # inter arrival times, mean 1
+        self.inter_arrival_time = VariateStream(seed=self.sim.seed, stream_number=0,
+                                                block_function=exponential_function,
+                                                block_size=block_size)
+
+        # process times
+        self.process_time = None
+        if self.sim.model_panel.PROCESS_TIME_DISTRIBUTION == "2_erlang":
+            if not self.sim.model_panel.TRUNCATION_POINT_PROCESS_TIME == 4:
+                raise Exception('No truncation dictionary available for this truncation point')
+            block_function = partial(two_erlang_function,
+                                     rate=1.975,
+                                     truncation_point=self.sim.model_panel.TRUNCATION_POINT_PROCESS_TIME)
+        elif self.sim.model_panel.PROCESS_TIME_DISTRIBUTION == "lognormal":
+            if self.sim.model_panel.TRUNCATION_POINT_PROCESS_TIME == "inf":
+                block_function = partial(
+                    log_normal_function,
+                    mean=self.sim.general_functions.mean_dictonary_inf[self.sim.model_panel.STD_DEV_PROCESS_TIME],
+                    sigma=self.sim.general_functions.stddev_dictonary_inf[self.sim.model_panel.STD_DEV_PROCESS_TIME])
+            elif self.sim.model_panel.TRUNCATION_POINT_PROCESS_TIME == 8:
+                truncation_point = self.sim.general_functions.truncation_dictionary_8[
+                    self.sim.model_panel.STD_DEV_PROCESS_TIME]
+                block_function = partial(
+                    log_normal_function,
+                    mean=self.sim.model_panel.MEAN_PROCESS_TIME,
+                    sigma=self.sim.model_panel.STD_DEV_PROCESS_TIME,
+                    truncation_point=truncation_point,
+                    scale=self.sim.model_panel.TRUNCATION_POINT_PROCESS_TIME / truncation_point)
+            else:
+                raise Exception('No truncation dictionary available for this truncation point')
+        else:
+            block_function = None
+
+        if block_function is not None:
+            self.process_time = VariateStream(seed=self.sim.seed, stream_number=1,
+                                              block_function=block_function,
+                                              block_size=block_size)
+
+        # routings, smaller blocks for large layouts
+        number_of_work_centres = len(self.sim.model_panel.MANUFACTURING_FLOOR_LAYOUT)
+        self.routing = VariateStream(seed=self.sim.seed, stream_number=2,
+                                     block_function=partial(routing_function,
+                                                            number_of_work_centres=number_of_work_centres,
+                                                            maximum_length=self.sim.model_panel.MAX_ROUTING_LENGTH),
+                                     block_size=max(64, block_size * 16 // number_of_work_centres))
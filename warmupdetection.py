@@ -0,0 +1,87 @@
+"""
+Project: ProcessSim
+Made By: Arno Kasper
+Version: 1.0.0
+"""
+import math
+import numpy as np
+
+
+class WarmUpDetection(object):
+    def __init__(self, simulation):
+        """
+        detect the warm-up period of the simulation model from the time series of a pilot run
+        :param simulation: simulation object
+        """
+        self.sim = simulation
+        self.batch_size = 5
+
+        # time series of the pilot run
+        self.times = list()
+        self.values = list()
+
+    def warm_up_period(self):
+        """
+        compute the truncation point of the time series of the pilot run
+        :return: warm-up period
+        """
+        if self.sim.model_panel.WARM_UP_DETECTION == "MSER-5":
+            truncation_index = self.mser(values=self.values)
+        else:
+            raise Exception("Please indicate an allowed warm-up detection method")
+
+        if truncation_index == 0:
+            return 0
+        return math.ceil(self.times[truncation_index - 1])
+
+    def collect_throughput_time(self, order):
+        """
+        add the throughput time of a finished order to the time series
+        :param order: order object
+        :return: void
+        """
+        self.times.append(self.sim.env.now)
+        self.values.append(order.finishing_time - order.entry_time)
+        return
+
+    def collect_work_in_process(self):
+        """
+        sample the number of orders in the system at a fixed interval
+        :return: void
+        """
+        while True:
+            self.times.append(self.sim.env.now)
+            self.values.append(self.sim.data_exp.order_input_counter - self.sim.data_exp.order_output_counter)
+            yield self.sim.env.timeout(self.sim.model_panel.WARM_UP_SAMPLE_INTERVAL)
+
+    def sample_work_in_process(self):
+        """
+        sample the number of orders in the system as event of the calendar engine, schedules the next sample
+        :return: void
+        """
+        self.times.append(self.sim.env.now)
+        self.values.append(self.sim.data_exp.order_input_counter - self.sim.data_exp.order_output_counter)
+        self.sim.env.schedule(self.sim.model_panel.WARM_UP_SAMPLE_INTERVAL, self.sample_work_in_process)
+        return
+
+    def mser(self, values):
+        """
+        Marginal Standard Error Rule on batch means (MSER-5). The truncation minimizes the squared deviations of the
+        remaining batch means divided by the squared number of remaining batches, searched over the first half
+        :param values: time series
+        :return: number of observations to truncate
+        """
+        number_of_batches = len(values) // self.batch_size
+        if number_of_batches < 2:
+            return 0
+        batch_means = np.asarray(values[:number_of_batches * self.batch_size], dtype=float).reshape(
+            number_of_batches, self.batch_size).mean(axis=1)
+
+        # sums over the remaining batches for each truncation point
+        remaining = np.arange(number_of_batches, 0, -1)
+        sums = np.cumsum(batch_means[::-1])[::-1]
+        sums_squares = np.cumsum(batch_means[::-1] ** 2)[::-1]
+        mser = (sums_squares - sums ** 2 / remaining) / remaining ** 2
+
+        truncation_batch = int(np.argmin(mser[:number_of_batches // 2 + 1]))
+        return truncation_batch * self.batch_size